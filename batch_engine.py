@@ -0,0 +1,163 @@
+import numpy as np
+
+from server import BOARD, TO_WIN, Direction, Kind, State
+
+# Vectorized copy of the Game roll/move/verify cycle for stepping many
+# independent games at once. Every per-game value lives in a NumPy array and
+# the board is flattened into lookup tables built from BOARD.transitions, so a
+# step follows exactly the same rules as Board.move_player.
+
+DIRECTIONS = tuple(Direction)
+STATES = tuple(State)
+DIRECTION_CODES = {direction: code for code, direction in enumerate(DIRECTIONS)}
+STATE_CODES = {state: code for code, state in enumerate(STATES)}
+CATEGORY_BITS = {Kind.CATEGORY1: 1, Kind.CATEGORY2: 2, Kind.CATEGORY3: 4, Kind.CATEGORY4: 8}
+
+KEEP_DIRECTION = -1
+START_LOCATION = 99
+RING = (DIRECTION_CODES[Direction.CLOCKWISE], DIRECTION_CODES[Direction.COUNTER_CLOCKWISE])
+INSIDE = tuple(DIRECTION_CODES[d] for d in DIRECTIONS if d not in {Direction.CLOCKWISE, Direction.COUNTER_CLOCKWISE})
+
+# Tables are indexed by board location. The last slot holds the -1 empty
+# cell, which NumPy's negative indexing reaches directly.
+TABLE_SIZE = max(BOARD.index_map) + 2
+
+
+def _build_tables():
+    next_location = np.full((TABLE_SIZE, len(DIRECTIONS), 2), -1, dtype=np.int16)
+    next_direction = np.zeros((TABLE_SIZE, len(DIRECTIONS), 2), dtype=np.int8)
+    stop = np.zeros((TABLE_SIZE, len(DIRECTIONS), 2), dtype=bool)
+    for (location, direction, complete), (location_out, direction_out, stop_out) in BOARD.transitions.items():
+        key = (location, DIRECTION_CODES[direction], int(complete))
+        next_location[key] = location_out
+        next_direction[key] = DIRECTION_CODES[direction_out]
+        stop[key] = stop_out
+
+    # Mirrors Board.force_center_direction
+    center_direction = np.full(TABLE_SIZE, KEEP_DIRECTION, dtype=np.int8)
+    for location, direction in BOARD.center_directions.items():
+        center_direction[location] = DIRECTION_CODES[direction]
+
+    roll_again = np.zeros(TABLE_SIZE, dtype=bool)
+    category_bit = np.zeros(TABLE_SIZE, dtype=np.uint8)
+    is_hub = np.zeros(TABLE_SIZE, dtype=bool)
+    is_spoke = np.zeros(TABLE_SIZE, dtype=bool)
+    for location, square in BOARD.index_map.items():
+        roll_again[location] = square.kind == Kind.ROLL_AGAIN
+        category_bit[location] = CATEGORY_BITS.get(square.kind, 0)
+        is_hub[location] = square.is_hub
+    is_spoke[list(BOARD.spokes)] = True
+
+    return next_location, next_direction, stop, center_direction, roll_again, category_bit, is_hub, is_spoke
+
+
+NEXT_LOCATION, NEXT_DIRECTION, STOP, CENTER_DIRECTION, ROLL_AGAIN, CATEGORY_BIT, IS_HUB, IS_SPOKE = _build_tables()
+COMPLETE_MASK = (1 << TO_WIN) - 1
+
+
+class BatchGames:
+    def __init__(self, num_games, num_players, seed=None):
+        self.num_games = num_games
+        self.num_players = num_players
+        self.rng = np.random.default_rng(seed)
+
+        self.location = np.full((num_games, num_players), START_LOCATION, dtype=np.int16)
+        self.direction = np.full((num_games, num_players), DIRECTION_CODES[Direction.CLOCKWISE], dtype=np.int8)
+        self.score = np.zeros((num_games, num_players), dtype=np.uint8)
+        self.turn = np.zeros(num_games, dtype=np.int8)
+        self.roll = np.zeros(num_games, dtype=np.int8)
+        self.state = np.full(num_games, STATE_CODES[State.ROLL], dtype=np.int8)
+        self.finished = np.zeros(num_games, dtype=bool)
+        self.games = np.arange(num_games)
+
+    def in_state(self, state: State):
+        # Games that have been won no longer take part in any step
+        return (self.state == STATE_CODES[state]) & ~self.finished
+
+    def active_location(self):
+        return self.location[self.games, self.turn]
+
+    def active_complete(self):
+        return self.score[self.games, self.turn] == COMPLETE_MASK
+
+    def roll_dice(self, rolls=None):
+        # Games that are not waiting for a roll are left untouched
+        rolling = self.in_state(State.ROLL)
+        if rolls is None:
+            rolls = self.rng.integers(1, 7, size=self.num_games, dtype=np.int8)
+        self.roll = np.where(rolling, rolls, self.roll).astype(np.int8)
+        self.state[rolling] = STATE_CODES[State.MOVE]
+        return self.roll
+
+    def random_directions(self):
+        # Picks what TrivialComputeServer.get_available_directions would offer
+        location = self.active_location()
+        ring = np.array(RING, dtype=np.int8)[self.rng.integers(0, len(RING), size=self.num_games)]
+        inside = np.array(INSIDE, dtype=np.int8)[self.rng.integers(0, len(INSIDE), size=self.num_games)]
+
+        directions = np.where(location == START_LOCATION, inside, ring)
+        predetermined = IS_SPOKE[location] | (IS_HUB[location] & self.active_complete())
+        directions[predetermined] = KEEP_DIRECTION
+        return directions
+
+    def move(self, directions=None):
+        moving = self.in_state(State.MOVE) & (self.roll > 0)
+        games = self.games[moving]
+        turn = self.turn[moving]
+
+        location = self.location[games, turn]
+        direction = self.direction[games, turn]
+        complete = (self.score[games, turn] == COMPLETE_MASK).astype(np.int8)
+        roll = self.roll[moving]
+        if directions is not None:
+            chosen = np.asarray(directions, dtype=np.int8)[moving]
+            direction = np.where(chosen != KEEP_DIRECTION, chosen, direction).astype(np.int8)
+
+        stopped = np.zeros(len(games), dtype=bool)
+        while True:
+            stepping = (roll > 0) & ~stopped
+            if not stepping.any():
+                break
+            key = (location[stepping], direction[stepping], complete[stepping])
+            location[stepping] = NEXT_LOCATION[key]
+            direction[stepping] = NEXT_DIRECTION[key]
+            stopped[stepping] = STOP[key]
+            roll[stepping] -= 1
+
+        # Finished the roll without stopping: repoint towards center if necessary
+        landed = ~stopped
+        center = CENTER_DIRECTION[location]
+        repoint = landed & (complete == 1) & (center != KEEP_DIRECTION)
+        direction[repoint] = center[repoint]
+
+        state = self.state[moving]
+        state[landed & ROLL_AGAIN[location]] = STATE_CODES[State.ROLL]
+        state[landed & ~ROLL_AGAIN[location]] = STATE_CODES[State.QUESTION]
+        state[stopped & (roll == 0)] = STATE_CODES[State.QUESTION]
+
+        self.location[games, turn] = location
+        self.direction[games, turn] = direction
+        self.roll[moving] = roll
+        self.state[moving] = state
+
+    def verify_question(self, correct):
+        answering = self.in_state(State.QUESTION)
+        correct = np.asarray(correct, dtype=bool) & answering
+        location = self.active_location()
+
+        scoring = correct & IS_HUB[location]
+        games = self.games[scoring]
+        turn = self.turn[scoring]
+        self.score[games, turn] |= CATEGORY_BIT[location[scoring]]
+
+        # Mirrors the force_center_direction call after a token is won
+        center = CENTER_DIRECTION[location[scoring]]
+        repoint = (self.score[games, turn] == COMPLETE_MASK) & (center != KEEP_DIRECTION)
+        self.direction[games[repoint], turn[repoint]] = center[repoint]
+
+        # Answering the final question at the center wins the game
+        self.finished |= correct & (location == START_LOCATION) & self.active_complete()
+
+        wrong = answering & ~correct
+        self.turn[wrong] = (self.turn[wrong] + 1) % self.num_players
+        self.state[answering] = STATE_CODES[State.ROLL]
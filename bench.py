@@ -0,0 +1,270 @@
+import argparse
+import contextlib
+import json
+import os
+import platform
+import random
+import shutil
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+
+from question_bank import load_questions, write_spreadsheet
+from server import BOARD, Direction, Kind, QuestionRetriever, State, TrivialComputeServer
+from simulate import play_game
+
+# Benchmarks for the server hot paths on synthetic question banks. Every
+# benchmark runs for each bank size and player count; results are saved as
+# JSON keyed by name and parameters so two runs (say, before and after a
+# commit) can be compared with `python bench.py compare old.json new.json`.
+
+BANK_SIZES = (1_000, 100_000)
+PLAYER_COUNTS = (2, 4)
+CATEGORY_COUNT = 8
+REPEAT = 5
+THRESHOLD = 0.10
+
+
+def synthetic_rows(size, categories=CATEGORY_COUNT):
+    names = [f"Category {i + 1}" for i in range(categories)]
+    return [(f"Synthetic question {i}?", f"Answer {i}", names[i % categories]) for i in range(size)]
+
+
+def measure(step, number, repeat=REPEAT):
+    # Per-call times in microseconds over repeat rounds of number calls
+    rounds = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        for _ in range(number):
+            step()
+        rounds.append((time.perf_counter() - start) / number * 1e6)
+    return {'min_us': min(rounds), 'median_us': statistics.median(rounds), 'calls': number * repeat}
+
+
+def new_server(rows, players):
+    server = TrivialComputeServer(QuestionRetriever(rows), seed=1)
+    categories = list(server.get_categories_excel()[:4])
+    server.start_game([f"Player {i + 1}" for i in range(players)], categories)
+    return server, categories
+
+
+def bench_start_game(rows, players, number):
+    server, categories = new_server(rows, players)
+    names = [f"Player {i + 1}" for i in range(players)]
+    return measure(lambda: server.start_game(names, categories), number)
+
+
+def bench_roll(rows, players, number):
+    server, _ = new_server(rows, players)
+    game = server.game
+
+    def step():
+        game.state = State.ROLL
+        server.roll()
+    return measure(step, number)
+
+
+def bench_get_available_directions(rows, players, number):
+    server, _ = new_server(rows, players)
+    # Every square on the board, ring, spokes and center alike
+    locations = sorted(location for location in BOARD.index_map if location != -1)
+    player = server.game.active_player()
+
+    def step():
+        for location in locations:
+            player.location = location
+            server.get_available_directions()
+    result = measure(step, max(1, number // len(locations)))
+    # Report per call, not per sweep over the locations
+    return {key: value / len(locations) if key.endswith('_us') else value * len(locations) for key, value in result.items()}
+
+
+def bench_move(rows, players, number):
+    server, _ = new_server(rows, players)
+    game = server.game
+    player = game.active_player()
+    rng = random.Random(1)
+
+    def step():
+        # Around the outer ring, which has no choices to make
+        player.location = 2
+        player.direction = Direction.CLOCKWISE
+        game.state = State.MOVE
+        game.roll = rng.randint(1, 6)
+        server.move()
+    return measure(step, number)
+
+
+def bench_get_question(rows, players, number):
+    server, _ = new_server(rows, players)
+    game = server.game
+    game.active_player().location = 20
+    assert game.active_square().kind in (Kind.CATEGORY1, Kind.CATEGORY2, Kind.CATEGORY3, Kind.CATEGORY4)
+
+    def step():
+        game.state = State.QUESTION
+        server.get_question()
+    return measure(step, number)
+
+
+def bench_verify_question(rows, players, number):
+    server, _ = new_server(rows, players)
+    game = server.game
+    for player in game.players:
+        player.location = 20
+    rng = random.Random(1)
+
+    def step():
+        game.state = State.QUESTION
+        server.get_question()
+        server.verify_question(rng.random() < 0.5)
+    return measure(step, number)
+
+
+def bench_games(rows, players, number):
+    server, categories = new_server(rows, players)
+    rng = random.Random(1)
+    names = [f"Player {i + 1}" for i in range(players)]
+    games = max(1, number // 1000)
+    result = measure(lambda: play_game(server, names, categories, rng), games, repeat=3)
+    result['games_per_second'] = 1e6 / result['median_us']
+    return result
+
+
+def bench_load_rows(rows, players, number):
+    # Indexing a bank that is already in memory
+    return measure(lambda: QuestionRetriever(rows), 1, repeat=3)
+
+
+def bench_load_spreadsheet(rows, players, number, directory=None):
+    # Parsing the spreadsheet cold, then the cached load a restart sees
+    path = os.path.join(directory, f"bank-{len(rows)}.xlsx")
+    if not os.path.exists(path):
+        write_spreadsheet(path, rows)
+
+    def cold():
+        for suffix in ('.cache', '.sqlite'):
+            if os.path.exists(path + suffix):
+                os.remove(path + suffix)
+        load_questions(path)
+    result = {'cold_' + key: value for key, value in measure(cold, 1, repeat=2).items()}
+    result.update({'warm_' + key: value for key, value in measure(lambda: load_questions(path), 1, repeat=3).items()})
+    return result
+
+
+BENCHMARKS = {
+    'start_game': bench_start_game,
+    'roll': bench_roll,
+    'get_available_directions': bench_get_available_directions,
+    'move': bench_move,
+    'get_question': bench_get_question,
+    'verify_question': bench_verify_question,
+    'games': bench_games,
+    'load_rows': bench_load_rows,
+    'load_spreadsheet': bench_load_spreadsheet,
+}
+# Loading does not depend on the number of players, so it runs once per bank
+PER_BANK = {'load_rows', 'load_spreadsheet'}
+
+
+def commit():
+    try:
+        return subprocess.run(['git', 'rev-parse', '--short', 'HEAD'], capture_output=True, text=True,
+                              cwd=os.path.dirname(os.path.abspath(__file__))).stdout.strip() or None
+    except OSError:
+        return None
+
+
+def run(bank_sizes=BANK_SIZES, player_counts=PLAYER_COUNTS, names=None, number=20_000):
+    results = {}
+    directory = tempfile.mkdtemp()
+    try:
+        for size in bank_sizes:
+            rows = synthetic_rows(size)
+            for name, bench in BENCHMARKS.items():
+                if names and name not in names:
+                    continue
+                for players in player_counts[:1] if name in PER_BANK else player_counts:
+                    key = f"{name}[bank={size}]" if name in PER_BANK else f"{name}[bank={size},players={players}]"
+                    kwargs = {'directory': directory} if name == 'load_spreadsheet' else {}
+                    # Game and retriever code print as they go; keep the report readable
+                    with open(os.devnull, 'w') as devnull, contextlib.redirect_stdout(devnull):
+                        result = bench(rows, players, number, **kwargs)
+                    results[key] = dict(result, bank=size, players=None if name in PER_BANK else players)
+                    print(f"{key:55} {format_result(result)}", file=sys.stderr)
+    finally:
+        shutil.rmtree(directory)
+    return {
+        'commit': commit(),
+        'python': platform.python_version(),
+        'platform': platform.platform(),
+        'created': time.strftime('%Y-%m-%dT%H:%M:%S'),
+        'results': results,
+    }
+
+
+def format_result(result):
+    if 'games_per_second' in result:
+        return f"{result['games_per_second']:.1f} games/s"
+    if 'cold_median_us' in result:
+        return f"cold {result['cold_median_us'] / 1000:.1f} ms, warm {result['warm_median_us'] / 1000:.1f} ms"
+    return f"{result['median_us']:.2f} us/call"
+
+
+def headline(result):
+    # The number compared between runs; lower is better
+    for key in ('median_us', 'warm_median_us'):
+        if key in result:
+            return result[key]
+
+
+def compare(old, new, threshold=THRESHOLD):
+    # (key, old, new, ratio) for every benchmark in both runs, plus the
+    # keys whose time grew by more than threshold
+    rows, regressions = [], []
+    for key, result in new['results'].items():
+        if key not in old['results']:
+            continue
+        before, after = headline(old['results'][key]), headline(result)
+        ratio = after / before if before else float('inf')
+        rows.append((key, before, after, ratio))
+        if ratio > 1 + threshold:
+            regressions.append(key)
+    return rows, regressions
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description="Benchmark the TrivialComputeServer hot paths")
+    commands = parser.add_subparsers(dest='command')
+    run_parser = commands.add_parser('run', help="run the benchmarks and save JSON results")
+    run_parser.add_argument('--output', default='bench_results.json')
+    run_parser.add_argument('--bank-sizes', type=int, nargs='+', default=list(BANK_SIZES))
+    run_parser.add_argument('--players', type=int, nargs='+', default=list(PLAYER_COUNTS))
+    run_parser.add_argument('--only', nargs='+', choices=list(BENCHMARKS))
+    run_parser.add_argument('--number', type=int, default=20_000, help="calls per round for the microbenchmarks")
+    compare_parser = commands.add_parser('compare', help="compare two saved runs")
+    compare_parser.add_argument('old')
+    compare_parser.add_argument('new')
+    compare_parser.add_argument('--threshold', type=float, default=THRESHOLD)
+    args = parser.parse_args()
+
+    if args.command == 'compare':
+        with open(args.old) as f:
+            old = json.load(f)
+        with open(args.new) as f:
+            new = json.load(f)
+        rows, regressions = compare(old, new, args.threshold)
+        print(f"{old.get('commit')} -> {new.get('commit')}")
+        for key, before, after, ratio in rows:
+            flag = '  REGRESSION' if key in regressions else ''
+            print(f"{key:55} {before:12.2f} {after:12.2f} {ratio:7.2f}x{flag}")
+        sys.exit(1 if regressions else 0)
+
+    if args.command is None:
+        args = run_parser.parse_args([])
+    report = run(args.bank_sizes, args.players, args.only, args.number)
+    with open(args.output, 'w') as f:
+        json.dump(report, f, indent=2)
+    print(f"Saved {len(report['results'])} results to {args.output}")
@@ -4,7 +4,6 @@ import sys
 import platform
 import os
 import time
-import pandas as pd
 import webbrowser
 from PyQt5.QtWidgets import (
     QApplication, QMainWindow, QWidget, QVBoxLayout, QHBoxLayout,
@@ -17,8 +16,9 @@ from PyQt5.QtGui import QPixmap, QIcon, QFont
 from server import Direction, Game, Question, State, TrivialComputeServer, Kind
 
 class DiceRollDialog(QDialog):
-    def __init__(self, names):
+    def __init__(self, names, rng=random):
         super().__init__()
+        self.rng = rng
 
         self.setWindowTitle("Player Dice Rolls")
         self.setFixedSize(400, 300)  # Set the window size
@@ -44,7 +44,7 @@ class DiceRollDialog(QDialog):
         """Roll a dice for each player, ensure no ties, and return a sorted list of tuples (name, roll)."""
         rolls = {}
         while len(rolls) < len(names):
-            roll = random.randint(1, 6)
+            roll = self.rng.randint(1, 6)
             if roll not in rolls.values():
                 rolls[names[len(rolls)]] = roll
         return sorted(rolls.items(), key=lambda x: 0, reverse=False)
@@ -174,7 +174,7 @@ class BoardWidget(QWidget):
         self.setup_buttons()
         self.category_legend()
         
-        dialog = DiceRollDialog(self.player_names)
+        dialog = DiceRollDialog(self.player_names, self.game.rng)
 
         if dialog.exec_() == QDialog.Accepted:
             player_order = dialog.get_player_order()
@@ -705,6 +705,8 @@ class TrivialComputeClient(QMainWindow):
     def __init__(self):
         super().__init__()
         self.server = TrivialComputeServer()
+        # Pick up edits made in Creator Mode without restarting the app
+        self.server.question_retriever.watch()
         self.initUI()
 
     def initUI(self):
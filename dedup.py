@@ -0,0 +1,115 @@
+import re
+import sys
+import zlib
+
+import numpy as np
+
+# Near-duplicate question detection for imported banks. Each question text is
+# reduced to a MinHash signature of its character shingles; locality-sensitive
+# hashing buckets signatures band by band, so only questions sharing a bucket
+# are ever compared and the cost stays close to linear in the number of rows.
+
+PRIME = (1 << 31) - 1
+SHINGLE_SIZE = 5
+NUM_PERM = 64
+BANDS = 16
+THRESHOLD = 0.8
+
+
+def normalize(text):
+    return ' '.join(re.findall(r"\w+", str(text).lower()))
+
+
+def shingles(text, size=SHINGLE_SIZE):
+    text = normalize(text)
+    if len(text) <= size:
+        return {text}
+    return {text[i:i + size] for i in range(len(text) - size + 1)}
+
+
+class MinHasher:
+    def __init__(self, num_perm=NUM_PERM, seed=1):
+        # Universal hashes (a * x + b) mod PRIME; the products fit in uint64
+        rng = np.random.default_rng(seed)
+        self.a = rng.integers(1, PRIME, num_perm, dtype=np.uint64)
+        self.b = rng.integers(0, PRIME, num_perm, dtype=np.uint64)
+
+    def signature(self, text):
+        return self.signatures([text])[0]
+
+    def signatures(self, texts, chunk=50_000):
+        # (len(texts), num_perm) signatures. All shingle hashes of a chunk go in
+        # one flat array and each permutation is reduced per text with reduceat.
+        result = np.empty((len(texts), len(self.a)), dtype=np.uint64)
+        for start in range(0, len(texts), chunk):
+            hashes, offsets = [], []
+            for text in texts[start:start + chunk]:
+                offsets.append(len(hashes))
+                hashes.extend(zlib.crc32(s.encode()) % PRIME for s in shingles(text))
+            hashes = np.array(hashes, dtype=np.uint64)
+            offsets = np.array(offsets, dtype=np.int64)
+            for k, (a, b) in enumerate(zip(self.a, self.b)):
+                result[start:start + len(offsets), k] = np.minimum.reduceat((a * hashes + b) % PRIME, offsets)
+        return result
+
+
+def similarity(first, second):
+    # Fraction of matching MinHash values estimates the Jaccard similarity
+    return np.count_nonzero(first == second) / len(first)
+
+
+def find_duplicates(rows, threshold=THRESHOLD, num_perm=NUM_PERM, bands=BANDS):
+    # Clusters of near-duplicate rows as lists of row indexes, compared within
+    # a category only. rows are (question, answer, category, ...) tuples.
+    hasher = MinHasher(num_perm)
+    width = num_perm // bands
+    parent = list(range(len(rows)))
+
+    def find(i):
+        while parent[i] != i:
+            parent[i] = parent[parent[i]]
+            i = parent[i]
+        return i
+
+    indexes = [i for i, row in enumerate(rows) if row[0] is not None and row[0] == row[0]]
+    signatures = dict(zip(indexes, hasher.signatures([rows[i][0] for i in indexes])))
+    buckets = {}
+    for i in indexes:
+        category = rows[i][2]
+        signature = signatures[i]
+        band_keys = signature.reshape(bands, width)
+        for band in range(bands):
+            key = (category, band, band_keys[band].tobytes())
+            # Each bucket is checked against its first member only; transitive
+            # links through union-find group the rest of the cluster
+            first = buckets.setdefault(key, i)
+            if first == i or find(first) == find(i):
+                continue
+            if similarity(signatures[first], signature) >= threshold:
+                parent[find(i)] = find(first)
+
+    clusters = {}
+    for i in signatures:
+        clusters.setdefault(find(i), []).append(i)
+    return sorted((members for members in clusters.values() if len(members) > 1), key=lambda members: members[0])
+
+
+def collapse(rows, clusters):
+    # Keeps the first row of every cluster and drops the others
+    dropped = {i for members in clusters for i in members[1:]}
+    return [row for i, row in enumerate(rows) if i not in dropped]
+
+
+def report(rows, clusters):
+    print(f"Found {len(clusters)} near-duplicate clusters covering {sum(map(len, clusters))} questions")
+    for members in clusters:
+        print(f"- {rows[members[0]][2]}:")
+        for i in members:
+            print(f"    [{i}] {rows[i][0]}")
+
+
+if __name__ == '__main__':
+    from question_bank import load_questions
+    from server import QUESTION_FILE
+    bank = load_questions(sys.argv[1] if len(sys.argv) > 1 else QUESTION_FILE)
+    report(bank, find_duplicates(bank))
@@ -0,0 +1,233 @@
+import bisect
+import contextlib
+import io
+import json
+import os
+import struct
+
+from server import MAX_ROLL, State
+from snapshot import DIRECTION_CODES, DIRECTIONS, decode_game, encode_game
+
+# Append-only event log for one game. Every state change is a two-byte record
+# (a roll result, a move direction or a verify outcome), and a full snapshot
+# is appended every snapshot_every events. A small side index lists
+# (event count, offset) for each snapshot, so recovering a game, or replaying
+# it up to any event, reads one snapshot plus at most snapshot_every events.
+# Each game started on the log writes its metadata before its first snapshot;
+# the index remembers which metadata record applies to every snapshot.
+#
+#   log    M <len> <json metadata> | S <len> <event count> <snapshot> | R/V <value> | D <direction>
+#   index  <event count> <offset of the S record> <offset of the M record in force> per snapshot
+
+SNAPSHOT_EVERY = 64
+ROLL, MOVE, VERIFY, SNAPSHOT, META = b'R', b'D', b'V', b'S', b'M'
+EVENTS = (ROLL[0], MOVE[0], VERIFY[0])
+NO_DIRECTION = 255
+BLOCK = struct.Struct('<cI')
+SNAPSHOT_HEADER = struct.Struct('<cII')
+INDEX = struct.Struct('<III')
+
+
+class LogError(ValueError):
+    pass
+
+
+def index_path(path):
+    return path + '.idx'
+
+
+def read_index(path):
+    # [(event count, offset, metadata offset)], ignoring a torn last entry
+    try:
+        with open(index_path(path), 'rb') as f:
+            data = f.read()
+    except FileNotFoundError:
+        return []
+    usable = len(data) - len(data) % INDEX.size
+    return [INDEX.unpack_from(data, offset) for offset in range(0, usable, INDEX.size)]
+
+
+def parse_records(data, offset=0):
+    # (kind, value, offset, end) for each complete record; stops at a torn tail
+    while offset < len(data):
+        kind = data[offset]
+        if kind in EVENTS:
+            if offset + 2 > len(data):
+                return
+            yield kind, data[offset + 1], offset, offset + 2
+            offset += 2
+        elif kind == SNAPSHOT[0]:
+            if offset + SNAPSHOT_HEADER.size > len(data):
+                return
+            _, length, count = SNAPSHOT_HEADER.unpack_from(data, offset)
+            end = offset + SNAPSHOT_HEADER.size + length
+            if end > len(data):
+                return
+            yield kind, (count, bytes(data[offset + SNAPSHOT_HEADER.size:end])), offset, end
+            offset = end
+        elif kind == META[0]:
+            if offset + BLOCK.size > len(data):
+                return
+            _, length = BLOCK.unpack_from(data, offset)
+            end = offset + BLOCK.size + length
+            if end > len(data):
+                return
+            yield kind, json.loads(bytes(data[offset + BLOCK.size:end])), offset, end
+            offset = end
+        else:
+            raise LogError(f"Unknown record {kind!r} at offset {offset}")
+
+
+def apply_event(game, kind, value):
+    # Same transitions as TrivialComputeServer.roll/move/verify_question, with
+    # the outcome taken from the log instead of the dice or the players
+    if kind == ROLL[0]:
+        # Draw the roll anyway so the game's dice RNG stays where the live game left it
+        game.rng.randint(1, MAX_ROLL)
+        game.roll = value
+        game.state = State.MOVE
+    elif kind == MOVE[0]:
+        game.move(None if value == NO_DIRECTION else DIRECTIONS[value])
+    else:
+        game.verify_question(bool(value))
+
+
+class GameLog:
+    def __init__(self, path, snapshot_every=SNAPSHOT_EVERY):
+        self.path = path
+        self.snapshot_every = snapshot_every
+        self.events = 0
+        self.last_snapshot = 0
+        self.meta_offset = 0
+        self.offset = self.recover_tail()
+        self.fd = os.open(path, os.O_WRONLY | os.O_CREAT | os.O_APPEND, 0o644)
+        self.index_fd = os.open(index_path(path), os.O_WRONLY | os.O_CREAT | os.O_APPEND, 0o644)
+
+    def recover_tail(self):
+        # Event count and end of the last complete record of an existing log.
+        # Anything after that was torn by a crash and is cut off.
+        if not os.path.exists(self.path):
+            return 0
+        index = read_index(self.path)
+        size = os.path.getsize(self.path)
+        while index and index[-1][1] >= size:
+            index.pop()
+        count, start, self.meta_offset = index[-1] if index else (0, 0, 0)
+        with open(self.path, 'rb') as f:
+            f.seek(start)
+            data = f.read()
+        tail = 0
+        for kind, value, offset, tail in parse_records(data):
+            if kind == SNAPSHOT[0]:
+                count = value[0]
+                self.last_snapshot = count
+            elif kind == META[0]:
+                self.meta_offset = start + offset
+            else:
+                count += 1
+        end = start + tail
+        if end < size:
+            os.truncate(self.path, end)
+        with open(index_path(self.path), 'r+b' if os.path.exists(index_path(self.path)) else 'wb') as f:
+            f.truncate(len(index) * INDEX.size)
+        self.events = count
+        return end
+
+    def append(self, record):
+        os.write(self.fd, record)
+        self.offset += len(record)
+
+    def start(self, game, categories=None):
+        # Written when a game starts (or its players are reset)
+        meta = json.dumps({'categories': list(categories or [])}).encode()
+        self.meta_offset = self.offset
+        self.append(BLOCK.pack(META, len(meta)) + meta)
+        self.snapshot(game)
+
+    def snapshot(self, game):
+        data = encode_game(game)
+        os.write(self.index_fd, INDEX.pack(self.events, self.offset, self.meta_offset))
+        self.append(SNAPSHOT_HEADER.pack(SNAPSHOT, len(data), self.events) + data)
+        self.last_snapshot = self.events
+
+    def record(self, game, kind, value):
+        self.append(bytes((kind[0], value)))
+        self.events += 1
+        if self.events - self.last_snapshot >= self.snapshot_every:
+            self.snapshot(game)
+
+    def record_roll(self, game, roll):
+        self.record(game, ROLL, roll)
+
+    def record_move(self, game, direction):
+        self.record(game, MOVE, NO_DIRECTION if direction is None else DIRECTION_CODES[direction])
+
+    def record_verify(self, game, correct):
+        self.record(game, VERIFY, int(bool(correct)))
+
+    def sync(self):
+        os.fsync(self.fd)
+        os.fsync(self.index_fd)
+
+    def close(self):
+        os.close(self.fd)
+        os.close(self.index_fd)
+
+
+def read_metadata(path, offset=0):
+    with open(path, 'rb') as f:
+        f.seek(offset)
+        head = f.read(BLOCK.size)
+        if len(head) < BLOCK.size or head[:1] != META:
+            raise LogError(f"{path} has no game metadata at offset {offset}")
+        return json.loads(f.read(BLOCK.unpack(head)[1]))
+
+
+def replay(path, upto=None):
+    # (game, metadata, events applied) after the first upto events, or all of
+    # them; starts from the latest snapshot at or before that point
+    index = read_index(path)
+    counts = [entry[0] for entry in index]
+    position = bisect.bisect_right(counts, upto) - 1 if upto is not None else len(index) - 1
+    if position < 0:
+        raise LogError(f"{path} has no snapshot")
+    count, start, meta_offset = index[position]
+    meta = read_metadata(path, meta_offset)
+    with open(path, 'rb') as f:
+        f.seek(start)
+        data = f.read()
+
+    game = upcoming = None
+    # The game's own methods print every step; replay keeps quiet
+    with contextlib.redirect_stdout(io.StringIO()):
+        for kind, value, _, _ in parse_records(data):
+            if kind == SNAPSHOT[0]:
+                if game is not None and upto is not None and value[0] > upto:
+                    break
+                count, game = value[0], decode_game(value[1])
+                if upcoming is not None:
+                    meta, upcoming = upcoming, None
+            elif kind == META[0]:
+                # Belongs to the snapshot that follows it
+                upcoming = value
+            else:
+                if upto is not None and count >= upto:
+                    break
+                apply_event(game, kind, value)
+                count += 1
+    if game is None:
+        raise LogError(f"{path} has no snapshot")
+    return game, meta, count
+
+
+def events(path):
+    # (kind, value) of every event in order, for analysis views
+    with open(path, 'rb') as f:
+        data = f.read()
+    for kind, value, _, _ in parse_records(data):
+        if kind == ROLL[0]:
+            yield 'roll', value
+        elif kind == MOVE[0]:
+            yield 'move', None if value == NO_DIRECTION else DIRECTIONS[value]
+        elif kind == VERIFY[0]:
+            yield 'verify', bool(value)
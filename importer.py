@@ -0,0 +1,195 @@
+import argparse
+import codecs
+import csv
+import json
+import os
+
+from question_bank import COLUMNS, MEDIA_COLUMN, open_database
+
+# Streaming import of community question packs (CSV or JSONL) into a question
+# database that SQLiteQuestionRetriever can open. The source is read one chunk
+# of rows at a time, so memory stays flat however large the file is. Each
+# chunk is written together with the byte offset reached, in one transaction,
+# so an interrupted import resumes from the last committed chunk.
+
+CHUNK_SIZE = 10_000
+FIELDS = COLUMNS + [MEDIA_COLUMN]
+
+
+class QuestionImportError(Exception):
+    pass
+
+
+class LineReader:
+    # Text lines from a binary file, keeping the byte offset of the next line
+    def __init__(self, f, offset=0):
+        self.f = f
+        self.offset = offset
+        self.decoder = codecs.getincrementaldecoder('utf-8-sig' if offset == 0 else 'utf-8')()
+
+    def __iter__(self):
+        return self
+
+    def __next__(self):
+        line = self.f.readline()
+        if not line:
+            raise StopIteration
+        self.offset += len(line)
+        return self.decoder.decode(line)
+
+
+def read_header(path):
+    with open(path, 'rb') as f:
+        reader = LineReader(f)
+        header = next(csv.reader(reader), None)
+        if header is None:
+            raise QuestionImportError(f"{path} is empty")
+        return header, reader.offset
+
+
+def iter_csv(path, offset):
+    # (row, offset after the row); offset is where a resumed import picks up
+    header, header_end = read_header(path)
+    columns = {name.strip().lower(): i for i, name in enumerate(header)}
+    missing = [name for name in COLUMNS if name.lower() not in columns]
+    if missing:
+        raise QuestionImportError(f"{path} has no {', '.join(missing)} column")
+    indexes = [columns.get(name.lower()) for name in FIELDS]
+
+    with open(path, 'rb') as f:
+        f.seek(max(offset, header_end))
+        reader = LineReader(f, max(offset, header_end))
+        # csv.reader pulls exactly the lines of one record at a time, so the
+        # reader's offset is a record boundary after every row
+        for record in csv.reader(reader):
+            yield [record[i] if i is not None and i < len(record) else None for i in indexes], reader.offset
+
+
+def iter_jsonl(path, offset):
+    with open(path, 'rb') as f:
+        f.seek(offset)
+        reader = LineReader(f, offset)
+        for line in reader:
+            if not line.strip():
+                continue
+            try:
+                record = json.loads(line)
+            except json.JSONDecodeError:
+                yield None, reader.offset
+                continue
+            if not isinstance(record, dict):
+                yield None, reader.offset
+                continue
+            record = {str(key).lower(): value for key, value in record.items()}
+            yield [record.get(name.lower()) for name in FIELDS], reader.offset
+
+
+def validate(row):
+    # Cleaned (question, answer, category, media), or None if the row is unusable
+    if row is None:
+        return None
+    question, answer, category, media = row
+    question = str(question).strip() if question is not None else ''
+    category = str(category).strip() if category is not None else ''
+    if isinstance(answer, str):
+        answer = answer.strip()
+    if not question or not category or answer is None or answer == '':
+        return None
+    if isinstance(answer, (list, dict)):
+        return None
+    return question, answer, category, media or None
+
+
+def print_progress(done, total, imported, rejected):
+    percent = 100 * done / total if total else 100
+    print(f"Imported {imported} questions ({rejected} rejected), {percent:.1f}% of source read")
+
+
+def iter_chunks(source, offset=0, chunk_size=CHUNK_SIZE):
+    # (valid rows, offset after the last row read, rejected row count) per chunk
+    iter_rows = iter_jsonl if source.lower().endswith(('.jsonl', '.ndjson')) else iter_csv
+    chunk, rejected = [], 0
+    for row, offset in iter_rows(source, offset):
+        row = validate(row)
+        if row is None:
+            rejected += 1
+        else:
+            chunk.append(row)
+        if len(chunk) >= chunk_size:
+            yield chunk, offset, rejected
+            chunk, rejected = [], 0
+    yield chunk, offset, rejected
+
+
+def feed_retriever(retriever, source, chunk_size=CHUNK_SIZE, progress=print_progress):
+    # Adds a pack to an in-memory QuestionRetriever chunk by chunk. Not
+    # resumable, since the bank itself does not survive a restart.
+    total = os.stat(source).st_size
+    imported = rejected = 0
+    for chunk, offset, chunk_rejected in iter_chunks(source, 0, chunk_size):
+        retriever.add_rows(chunk)
+        imported += len(chunk)
+        rejected += chunk_rejected
+        progress(offset, total, imported, rejected)
+    return imported, rejected
+
+
+def import_questions(source, database, chunk_size=CHUNK_SIZE, progress=print_progress):
+    # Streams source into database and returns (imported, rejected) for this
+    # source overall, including rows committed by earlier interrupted runs
+    stat = os.stat(source)
+    key = f"import:{os.path.abspath(source)}"
+
+    conn = open_database(database)
+    try:
+        row = conn.execute("SELECT value FROM meta WHERE key = ?", (key,)).fetchone()
+        state = json.loads(row[0]) if row else None
+        if state and (state['size'], state['mtime_ns']) != (stat.st_size, stat.st_mtime_ns):
+            raise QuestionImportError(f"{source} changed since its import started; remove it from {database} to start over")
+        if state and state['done']:
+            return state['imported'], state['rejected']
+        state = state or {'offset': 0, 'imported': 0, 'rejected': 0, 'done': False,
+                          'size': stat.st_size, 'mtime_ns': stat.st_mtime_ns}
+
+        positions = dict(conn.execute("SELECT category, MAX(position) + 1 FROM questions GROUP BY category"))
+        chunks = iter_chunks(source, state['offset'], chunk_size)
+        chunk, offset, rejected = next(chunks)
+        for following in chunks:
+            write_chunk(conn, key, chunk, rejected, positions, state, offset)
+            progress(offset, stat.st_size, state['imported'], state['rejected'])
+            chunk, offset, rejected = following
+
+        # The final (possibly empty) chunk also marks the import as finished
+        state['done'] = True
+        write_chunk(conn, key, chunk, rejected, positions, state, offset)
+        progress(stat.st_size, stat.st_size, state['imported'], state['rejected'])
+        return state['imported'], state['rejected']
+    finally:
+        conn.close()
+
+
+def write_chunk(conn, key, chunk, rejected, positions, state, offset):
+    # The rows, their search entries and the resume point commit together
+    with conn:
+        last_id = conn.execute("SELECT COALESCE(MAX(id), 0) FROM questions").fetchone()[0]
+        numbered = []
+        for question, answer, category, media in chunk:
+            position = positions.get(category, 0)
+            positions[category] = position + 1
+            numbered.append((category, position, question, answer, media))
+        conn.executemany("INSERT INTO questions (category, position, question, answer, media) VALUES (?, ?, ?, ?, ?)", numbered)
+        conn.execute("INSERT INTO questions_search (rowid, question, answer, category) "
+                     "SELECT id, question, answer, category FROM questions WHERE id > ?", (last_id,))
+        state['imported'] += len(chunk)
+        state['rejected'] += rejected
+        state['offset'] = offset
+        conn.execute("INSERT OR REPLACE INTO meta (key, value) VALUES (?, ?)", (key, json.dumps(state)))
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description="Stream a CSV or JSONL question pack into a question database")
+    parser.add_argument('source')
+    parser.add_argument('database')
+    parser.add_argument('--chunk-size', type=int, default=CHUNK_SIZE)
+    args = parser.parse_args()
+    import_questions(args.source, args.database, args.chunk_size)
@@ -0,0 +1,173 @@
+import argparse
+import asyncio
+import base64
+import json
+import os
+import random
+import time
+
+from web_server import OP_CLOSE, OP_TEXT, encode_frame, read_message
+
+# Local load generator for web_server.py. Each simulated table creates a game
+# over HTTP, opens a WebSocket on it and plays random turns, waiting for the
+# reply to every action. Pushed state messages are counted but not needed,
+# since every reply already carries the new state.
+
+
+async def http_request(host, port, method, path, payload=None):
+    reader, writer = await asyncio.open_connection(host, port)
+    try:
+        body = b'' if payload is None else json.dumps(payload).encode()
+        writer.write((f"{method} {path} HTTP/1.1\r\nHost: {host}\r\nConnection: close\r\n"
+                      f"Content-Type: application/json\r\nContent-Length: {len(body)}\r\n\r\n").encode() + body)
+        await writer.drain()
+        head = await reader.readuntil(b'\r\n\r\n')
+        status = int(head.split(b' ', 2)[1])
+        headers = {}
+        for line in head.decode('latin-1').split('\r\n')[1:]:
+            if ':' in line:
+                name, value = line.split(':', 1)
+                headers[name.strip().lower()] = value.strip()
+        body = await reader.readexactly(int(headers.get('content-length', 0)))
+        if headers.get('content-type', '').startswith('text/plain'):
+            return status, body.decode()
+        return status, json.loads(body) if body else None
+    finally:
+        writer.close()
+
+
+class GameConnection:
+    def __init__(self, reader, writer):
+        self.reader = reader
+        self.writer = writer
+        self.next_id = 0
+        self.pushes = 0
+
+    @classmethod
+    async def open(cls, host, port, game_id):
+        reader, writer = await asyncio.open_connection(host, port)
+        key = base64.b64encode(os.urandom(16)).decode()
+        writer.write((f"GET /games/{game_id}/ws HTTP/1.1\r\nHost: {host}\r\nUpgrade: websocket\r\n"
+                      f"Connection: Upgrade\r\nSec-WebSocket-Key: {key}\r\nSec-WebSocket-Version: 13\r\n\r\n").encode())
+        head = await reader.readuntil(b'\r\n\r\n')
+        if not head.startswith(b'HTTP/1.1 101'):
+            writer.close()
+            raise ConnectionError(head.decode('latin-1').split('\r\n')[0])
+        return cls(reader, writer)
+
+    async def receive(self):
+        opcode, payload = await read_message(self.reader, self.writer, mask=True)
+        if opcode == OP_CLOSE:
+            raise ConnectionError("Server closed the WebSocket")
+        return json.loads(payload)
+
+    async def send(self, action, **params):
+        # Reply to this action; state pushes arriving first are skipped
+        self.next_id += 1
+        self.writer.write(encode_frame(OP_TEXT, json.dumps(dict(params, action=action, id=self.next_id)).encode(), mask=True))
+        await self.writer.drain()
+        while True:
+            message = await self.receive()
+            if message['type'] == 'result' and message['id'] == self.next_id:
+                return message
+            self.pushes += 1
+
+    async def close(self):
+        self.writer.write(encode_frame(OP_CLOSE, b'\x03\xe8', mask=True))
+        await self.writer.drain()
+        self.writer.close()
+
+
+async def play_turn(connection, state, rng):
+    # One step of a random player, one round trip per action
+    if state['state'] == 'ROLL':
+        return await connection.send('roll')
+    if state['state'] == 'MOVE':
+        reply = await connection.send('directions')
+        directions = reply.get('directions')
+        return await connection.send('move', direction=rng.choice(directions) if directions else None)
+    reply = await connection.send('question')
+    if not reply['ok']:
+        # The center square has no category; answer it anyway
+        return await connection.send('verify', correct=False)
+    return await connection.send('verify', correct=rng.random() < 0.5)
+
+
+async def play_batched_turn(connection, state, rng):
+    # The same step using batches: roll with the direction lookup, and
+    # question with verify, each go out as one message
+    if state['state'] == 'ROLL':
+        reply = await connection.send('batch', actions=[{'action': 'roll'}, {'action': 'directions'}])
+        if not reply['ok'] or reply['state']['state'] != 'MOVE':
+            return reply
+        directions = reply['results'][-1]['directions']
+    elif state['state'] == 'MOVE':
+        directions = (await connection.send('directions'))['directions']
+    else:
+        reply = await connection.send('batch', actions=[{'action': 'question'},
+                                                        {'action': 'verify', 'correct': rng.random() < 0.5}])
+        if not reply['ok'] and reply['error']['index'] == 0:
+            return await connection.send('verify', correct=False)
+        return reply
+    return await connection.send('move', direction=rng.choice(directions) if directions else None)
+
+
+async def play(host, port, players, categories, actions, rng, latencies, batch=False):
+    # Returns (actions sent, failed actions, state pushes received)
+    status, state = await http_request(host, port, 'POST', '/games', {'players': players, 'categories': categories})
+    if status != 201:
+        raise ConnectionError(f"Could not create a game: {state}")
+    connection = await GameConnection.open(host, port, state['game_id'])
+    await connection.receive()  # initial state
+    failed = 0
+    for _ in range(actions):
+        start = time.perf_counter()
+        reply = await (play_batched_turn if batch else play_turn)(connection, state, rng)
+        latencies.append(time.perf_counter() - start)
+        if not reply['ok']:
+            failed += 1
+            status, state = await http_request(host, port, 'GET', f"/games/{state['game_id']}")
+        else:
+            state = reply['state']
+    await connection.close()
+    await http_request(host, port, 'DELETE', f"/games/{state['game_id']}")
+    return actions, failed, connection.pushes
+
+
+async def generate_load(host='127.0.0.1', port=8080, games=100, players=2, actions=20, categories=None, seed=0, batch=False):
+    # Plays games concurrent tables and returns throughput and latency figures
+    if categories is None:
+        status, body = await http_request(host, port, 'GET', '/categories')
+        categories = body['categories'][:4]
+    rng = random.Random(seed)
+    latencies = []
+    names = [f"Player {i + 1}" for i in range(players)]
+    start = time.perf_counter()
+    results = await asyncio.gather(*(play(host, port, names, categories, actions, random.Random(rng.random()), latencies, batch)
+                                     for _ in range(games)))
+    elapsed = time.perf_counter() - start
+    latencies.sort()
+    total = sum(sent for sent, _, _ in results)
+    return {
+        'games': games,
+        'actions': total,
+        'failed': sum(failed for _, failed, _ in results),
+        'pushes': sum(pushes for _, _, pushes in results),
+        'seconds': elapsed,
+        'actions_per_second': total / elapsed if elapsed else 0.0,
+        'p50_ms': 1000 * latencies[len(latencies) // 2] if latencies else 0.0,
+        'p99_ms': 1000 * latencies[int(len(latencies) * 0.99)] if latencies else 0.0,
+    }
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description="Play many concurrent games against web_server.py")
+    parser.add_argument('--host', default='127.0.0.1')
+    parser.add_argument('--port', type=int, default=8080)
+    parser.add_argument('--games', type=int, default=100)
+    parser.add_argument('--players', type=int, default=2)
+    parser.add_argument('--actions', type=int, default=20)
+    parser.add_argument('--batch', action='store_true', help="send each turn as batched actions")
+    args = parser.parse_args()
+    stats = generate_load(args.host, args.port, args.games, args.players, args.actions, batch=args.batch)
+    print(json.dumps(asyncio.run(stats), indent=2))
@@ -0,0 +1,77 @@
+import mmap
+import os
+import threading
+from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor
+
+# Image/audio assets referenced by questions. Files are loaded on first use
+# and kept in a least-recently-used cache bounded by total bytes, so the bank
+# can reference any amount of media without loading it up front. Large files
+# are memory-mapped; each map holds a file descriptor, so small files, which
+# could fill the cache with thousands of them, are read into bytes instead.
+
+MEDIA_CACHE_BYTES = 64 * 1024 * 1024
+MMAP_BYTES = 1024 * 1024
+
+
+class MediaCache:
+    def __init__(self, max_bytes=MEDIA_CACHE_BYTES, mmap_bytes=MMAP_BYTES):
+        self.max_bytes = max_bytes
+        self.mmap_bytes = mmap_bytes
+        self.size = 0
+        self.entries = OrderedDict()
+        self.lock = threading.Lock()
+        self.prefetcher = None
+
+    def get(self, path):
+        with self.lock:
+            data = self.entries.get(path)
+            if data is not None:
+                self.entries.move_to_end(path)
+                return data
+
+        data = self.read(path)
+        with self.lock:
+            if path in self.entries:
+                # Another thread loaded it while we were reading
+                self.entries.move_to_end(path)
+                return self.entries[path]
+            if len(data) <= self.max_bytes:
+                self.entries[path] = data
+                self.size += len(data)
+                while self.size > self.max_bytes:
+                    _, evicted = self.entries.popitem(last=False)
+                    self.size -= len(evicted)
+        return data
+
+    def read(self, path):
+        with open(path, 'rb') as f:
+            if os.fstat(f.fileno()).st_size < self.mmap_bytes:
+                return f.read()
+            # The map stays valid after the file is closed; pages are read on demand
+            return mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+
+    def prefetch(self, path):
+        # Load in the background so the next draw finds the asset already cached
+        if not path:
+            return
+        with self.lock:
+            if path in self.entries:
+                return
+            if self.prefetcher is None:
+                self.prefetcher = ThreadPoolExecutor(max_workers=1, thread_name_prefix='media-prefetch')
+        self.prefetcher.submit(self.load_quietly, path)
+
+    def load_quietly(self, path):
+        try:
+            self.get(path)
+        except OSError as e:
+            print(f"Could not prefetch media {path}: {e}")
+
+    def clear(self):
+        with self.lock:
+            self.entries.clear()
+            self.size = 0
+
+
+MEDIA_CACHE = MediaCache()
@@ -0,0 +1,213 @@
+import bisect
+import functools
+import os
+import sys
+import threading
+import time
+
+from server import QuestionRetriever, TrivialComputeServer
+
+# Optional latency instrumentation. enable() wraps every public
+# TrivialComputeServer method, and the loading methods of every
+# QuestionRetriever class, in a timer that feeds a histogram; disable() puts
+# the original functions back, so a server that never enables metrics runs
+# exactly the code it would without this module. Results come out in the
+# Prometheus text format, pulled from web_server's /metrics or dumped to a
+# file every few seconds.
+
+BUCKETS = tuple(1e-6 * 2 ** i for i in range(24))  # 1 us to about 8 s
+SERVER_CALLS = 'trivial_compute_server_call_seconds'
+SERVER_ERRORS = 'trivial_compute_server_errors_total'
+SERVER_REJECTED = 'trivial_compute_server_rejected_total'
+BANK_LOADS = 'trivial_compute_bank_load_seconds'
+RETRIEVER_METHODS = ('__init__', 'reload', 'set_categories', 'add_rows')
+
+
+class Histogram:
+    __slots__ = ("bounds", "counts", "total", "count", "lock")
+
+    def __init__(self, bounds=BUCKETS):
+        self.bounds = bounds
+        self.counts = [0] * (len(bounds) + 1)
+        self.total = 0.0
+        self.count = 0
+        self.lock = threading.Lock()
+
+    def observe(self, seconds):
+        i = bisect.bisect_left(self.bounds, seconds)
+        with self.lock:
+            self.counts[i] += 1
+            self.total += seconds
+            self.count += 1
+
+    def quantile(self, q):
+        # Upper bound of the bucket holding the q-th observation
+        with self.lock:
+            counts, count = list(self.counts), self.count
+        seen = 0
+        for bound, bucket in zip(self.bounds + (float('inf'),), counts):
+            seen += bucket
+            if count and seen >= q * count:
+                return bound
+        return 0.0
+
+
+class Metrics:
+    def __init__(self):
+        self.histograms = {}
+        self.counters = {}
+        self.lock = threading.Lock()
+        self.patched = []
+        self.dumper = None
+        self.stop_event = threading.Event()
+
+    @property
+    def enabled(self):
+        return bool(self.patched)
+
+    def histogram(self, name, **labels):
+        key = (name, tuple(sorted(labels.items())))
+        histogram = self.histograms.get(key)
+        if histogram is None:
+            with self.lock:
+                histogram = self.histograms.setdefault(key, Histogram())
+        return histogram
+
+    def increment(self, name, amount=1, **labels):
+        key = (name, tuple(sorted(labels.items())))
+        with self.lock:
+            self.counters[key] = self.counters.get(key, 0) + amount
+
+    def clear(self):
+        # Histograms are zeroed in place since the installed timers hold on to them
+        with self.lock:
+            for histogram in self.histograms.values():
+                with histogram.lock:
+                    histogram.counts = [0] * len(histogram.counts)
+                    histogram.total = 0.0
+                    histogram.count = 0
+            self.counters = {}
+
+    def timed(self, fn, histogram, errors, rejected=None):
+        @functools.wraps(fn)
+        def wrapper(*args, **kwargs):
+            start = time.perf_counter()
+            try:
+                result = fn(*args, **kwargs)
+            except BaseException:
+                self.increment(errors[0], **errors[1])
+                raise
+            finally:
+                histogram.observe(time.perf_counter() - start)
+            # -1 is how the server turns down a call made in the wrong State
+            if rejected is not None and type(result) is int and result == -1:
+                self.increment(rejected[0], **rejected[1])
+            return result
+        return wrapper
+
+    def patch(self, cls, name, wrapper):
+        self.patched.append((cls, name, cls.__dict__[name]))
+        setattr(cls, name, wrapper)
+
+    def enable(self):
+        if self.enabled:
+            return
+        for name, fn in list(vars(TrivialComputeServer).items()):
+            if name.startswith('_') or not callable(fn):
+                continue
+            histogram = self.histogram(SERVER_CALLS, method=name)
+            self.patch(TrivialComputeServer, name, self.timed(fn, histogram, (SERVER_ERRORS, {'method': name}),
+                                                              (SERVER_REJECTED, {'method': name})))
+        for cls in retriever_classes():
+            for name in RETRIEVER_METHODS:
+                if name in vars(cls):
+                    histogram = self.histogram(BANK_LOADS, retriever=cls.__name__, step=name)
+                    errors = (SERVER_ERRORS, {'method': f"{cls.__name__}.{name}"})
+                    self.patch(cls, name, self.timed(vars(cls)[name], histogram, errors))
+
+    def disable(self):
+        while self.patched:
+            cls, name, fn = self.patched.pop()
+            setattr(cls, name, fn)
+
+    def render(self):
+        # Prometheus text exposition format
+        lines = []
+        with self.lock:
+            histograms = sorted(self.histograms.items())
+            counters = sorted(self.counters.items())
+        typed = set()
+        for (name, labels), histogram in histograms:
+            if name not in typed:
+                lines.append(f"# TYPE {name} histogram")
+                typed.add(name)
+            with histogram.lock:
+                counts, total, count = list(histogram.counts), histogram.total, histogram.count
+            cumulative = 0
+            for bound, bucket in zip(histogram.bounds + (float('inf'),), counts):
+                cumulative += bucket
+                le = '+Inf' if bound == float('inf') else f"{bound:.6g}"
+                lines.append(f"{name}_bucket{format_labels(labels + (('le', le),))} {cumulative}")
+            lines.append(f"{name}_sum{format_labels(labels)} {total:.9g}")
+            lines.append(f"{name}_count{format_labels(labels)} {count}")
+        for (name, labels), value in counters:
+            if name not in typed:
+                lines.append(f"# TYPE {name} counter")
+                typed.add(name)
+            lines.append(f"{name}{format_labels(labels)} {value}")
+        return '\n'.join(lines) + '\n'
+
+    def dump(self, path=None):
+        text = self.render()
+        if path is None:
+            sys.stderr.write(text)
+            return
+        tmp_path = f"{path}.{os.getpid()}.tmp"
+        with open(tmp_path, 'w') as f:
+            f.write(text)
+        os.replace(tmp_path, path)
+
+    def start_dumping(self, interval=10.0, path=None):
+        # Writes the metrics to path (or stderr) every interval seconds
+        if self.dumper is not None:
+            return
+        self.stop_event.clear()
+        self.dumper = threading.Thread(target=self.dump_periodically, args=(interval, path), daemon=True)
+        self.dumper.start()
+
+    def stop_dumping(self):
+        if self.dumper is None:
+            return
+        self.stop_event.set()
+        self.dumper.join()
+        self.dumper = None
+
+    def dump_periodically(self, interval, path):
+        while not self.stop_event.wait(interval):
+            try:
+                self.dump(path)
+            except OSError as e:
+                print(f"Could not write metrics: {e}")
+
+
+def format_labels(labels):
+    if not labels:
+        return ''
+    return '{' + ','.join(f'{key}="{value}"' for key, value in labels) + '}'
+
+
+def retriever_classes():
+    # QuestionRetriever and every subclass. The backends are imported here
+    # because sessions only imports shards when its first game starts, which
+    # is after enable() has run.
+    import shards  # noqa: F401
+    import sqlite_retriever  # noqa: F401
+    classes, pending = [], [QuestionRetriever]
+    while pending:
+        cls = pending.pop()
+        classes.append(cls)
+        pending.extend(cls.__subclasses__())
+    return classes
+
+
+METRICS = Metrics()
@@ -0,0 +1,207 @@
+import hashlib
+import os
+import pickle
+import sqlite3
+import tempfile
+import threading
+
+COLUMNS = ["Question", "Answer", "Category"]
+# Optional column with the path of an image/audio file for the question
+MEDIA_COLUMN = "Media"
+CACHE_VERSION = 4
+CACHE_SUFFIX = '.cache'
+PATH_LOCKS = {}
+PATH_LOCKS_LOCK = threading.Lock()
+
+
+def read_spreadsheet(path):
+    # Streams the first sheet in openpyxl's read-only mode. Rows come back as
+    # (question, answer, category, media) with None for empty cells.
+    from openpyxl import load_workbook
+    workbook = load_workbook(path, read_only=True, data_only=True)
+    try:
+        rows = workbook.worksheets[0].iter_rows(values_only=True)
+        header = next(rows, ())
+        columns = [header.index(column) for column in COLUMNS]
+        media = header.index(MEDIA_COLUMN) if MEDIA_COLUMN in header else None
+        table = []
+        for row in rows:
+            values = tuple(row[i] if i < len(row) else None for i in columns)
+            if any(value is not None for value in values):
+                table.append(values + (row[media] if media is not None and media < len(row) else None,))
+        return table
+    finally:
+        workbook.close()
+
+
+def write_spreadsheet(path, rows):
+    # The reverse of read_spreadsheet: a COLUMNS header, then one row per question
+    from openpyxl import Workbook
+    workbook = Workbook(write_only=True)
+    sheet = workbook.create_sheet()
+    sheet.append(COLUMNS)
+    for row in rows:
+        sheet.append(row)
+    workbook.save(path)
+
+
+def file_digest(path):
+    digest = hashlib.sha256()
+    with open(path, 'rb') as f:
+        for chunk in iter(lambda: f.read(1 << 20), b''):
+            digest.update(chunk)
+    return digest.hexdigest()
+
+
+def path_lock(path):
+    # One lock per spreadsheet, so threads in a process build its derived files one at a time
+    with PATH_LOCKS_LOCK:
+        return PATH_LOCKS.setdefault(os.path.abspath(path), threading.RLock())
+
+
+def temp_path(path):
+    # A new, uniquely named file next to path; the pid alone is shared by every thread
+    fd, tmp_path = tempfile.mkstemp(dir=os.path.dirname(path) or '.', prefix=os.path.basename(path) + '.', suffix='.tmp')
+    os.close(fd)
+    return tmp_path
+
+
+def read_cache(cache_path):
+    try:
+        with open(cache_path, 'rb') as f:
+            cache = pickle.load(f)
+    except (OSError, pickle.UnpicklingError, EOFError):
+        return None
+    if not isinstance(cache, dict) or cache.get('version') != CACHE_VERSION:
+        return None
+    return cache
+
+
+def write_cache(cache_path, cache):
+    # Write to a temporary file first so a crash never leaves a half-written cache
+    tmp_path = None
+    try:
+        tmp_path = temp_path(cache_path)
+        with open(tmp_path, 'wb') as f:
+            pickle.dump(cache, f, protocol=pickle.HIGHEST_PROTOCOL)
+        os.replace(tmp_path, cache_path)
+    except OSError as e:
+        print(f"Could not write question cache {cache_path}: {e}")
+        if tmp_path and os.path.exists(tmp_path):
+            os.remove(tmp_path)
+
+
+def load_questions(path):
+    # Parsed (question, answer, category) rows, read from the cache next to the
+    # spreadsheet unless the spreadsheet has changed since the cache was written
+    cache_path = path + CACHE_SUFFIX
+    stat = os.stat(path)
+    cache = read_cache(cache_path)
+
+    if cache and cache['size'] == stat.st_size and cache['mtime_ns'] == stat.st_mtime_ns:
+        return cache['rows']
+
+    digest = file_digest(path)
+    if cache and cache['sha256'] == digest:
+        # Touched but not modified: keep the rows and refresh the file metadata
+        rows = cache['rows']
+    else:
+        print(f"Parsing question bank {path}")
+        rows = read_spreadsheet(path)
+
+    write_cache(cache_path, {
+        'version': CACHE_VERSION,
+        'size': stat.st_size,
+        'mtime_ns': stat.st_mtime_ns,
+        'sha256': digest,
+        'rows': rows,
+    })
+    return rows
+
+
+DATABASE_SUFFIX = '.sqlite'
+SCHEMA = """
+CREATE TABLE meta (key TEXT PRIMARY KEY, value);
+CREATE TABLE questions (
+    id INTEGER PRIMARY KEY,
+    category TEXT NOT NULL,
+    position INTEGER NOT NULL,
+    question TEXT,
+    answer,
+    media TEXT
+);
+CREATE UNIQUE INDEX questions_category_position ON questions (category, position);
+CREATE VIRTUAL TABLE questions_search USING fts5(question, answer, category, content='questions', content_rowid='id');
+"""
+
+
+def read_database_meta(conn):
+    try:
+        return dict(conn.execute("SELECT key, value FROM meta"))
+    except sqlite3.DatabaseError:
+        return {}
+
+
+def open_database(db_path):
+    # Connection to a question database, creating the tables if the file is new
+    conn = sqlite3.connect(db_path)
+    if not conn.execute("SELECT name FROM sqlite_master WHERE name = 'questions'").fetchone():
+        conn.executescript(SCHEMA)
+    return conn
+
+
+def build_database(db_path, rows, meta):
+    # Numbers each category's rows 0..n-1 so a random draw is one indexed lookup
+    # SQLite treats the empty file as a new database
+    tmp_path = temp_path(db_path)
+    conn = sqlite3.connect(tmp_path)
+    try:
+        conn.executescript(SCHEMA)
+        positions = {}
+
+        def numbered():
+            for row in rows:
+                question, answer, category = row[:3]
+                if category != category or category is None:
+                    continue
+                position = positions.get(category, 0)
+                positions[category] = position + 1
+                yield category, position, question, None if answer != answer else answer, row[3] if len(row) > 3 else None
+
+        conn.executemany("INSERT INTO questions (category, position, question, answer, media) VALUES (?, ?, ?, ?, ?)", numbered())
+        conn.execute("INSERT INTO questions_search (questions_search) VALUES ('rebuild')")
+        conn.executemany("INSERT INTO meta (key, value) VALUES (?, ?)", meta.items())
+        conn.commit()
+    finally:
+        conn.close()
+    return tmp_path
+
+
+def prepare_database(path):
+    # Path of an up to date SQLite copy of the spreadsheet, and a freshly built
+    # file to move into place first if the existing copy is missing or stale
+    db_path = path + DATABASE_SUFFIX
+    stat = os.stat(path)
+    meta = {}
+    if os.path.exists(db_path):
+        conn = sqlite3.connect(db_path)
+        try:
+            meta = read_database_meta(conn)
+        finally:
+            conn.close()
+
+    if meta.get('version') == CACHE_VERSION and meta.get('size') == stat.st_size and meta.get('mtime_ns') == stat.st_mtime_ns:
+        return db_path, None
+
+    digest = file_digest(path)
+    if meta.get('version') == CACHE_VERSION and meta.get('sha256') == digest:
+        conn = sqlite3.connect(db_path)
+        try:
+            conn.executemany("UPDATE meta SET value = ? WHERE key = ?", [(stat.st_size, 'size'), (stat.st_mtime_ns, 'mtime_ns')])
+            conn.commit()
+        finally:
+            conn.close()
+        return db_path, None
+
+    meta = {'version': CACHE_VERSION, 'size': stat.st_size, 'mtime_ns': stat.st_mtime_ns, 'sha256': digest}
+    return db_path, build_database(db_path, load_questions(path), meta)
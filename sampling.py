@@ -0,0 +1,127 @@
+import math
+import random
+import threading
+
+# Difficulty-weighted question draws. Answer results are tallied per question
+# and each category gets a WeightTree of per-question weights favouring a
+# target difficulty. An answer changes one weight in O(log n) right away, so
+# there is nothing to rebuild, draws cost O(log n) without ever scanning the
+# bank, and a seeded game draws the same questions every time.
+
+class WeightTree:
+    # Fenwick tree over n weights that all start at default. Only nodes whose
+    # sums differ from the default are stored, so a tree over a large category
+    # costs nothing until its questions are answered.
+    __slots__ = ("size", "default", "deltas", "weights", "total", "top")
+
+    def __init__(self, size, default=1.0):
+        self.size = size
+        self.default = default
+        self.deltas = {}
+        self.weights = {}
+        self.total = default * size
+        self.top = 1 << (size.bit_length() - 1) if size else 0
+
+    def __len__(self):
+        return self.size
+
+    def weight(self, i):
+        return self.weights.get(i, self.default)
+
+    def set(self, i, weight):
+        change = weight - self.weight(i)
+        self.weights[i] = weight
+        self.total += change
+        node = i + 1
+        while node <= self.size:
+            self.deltas[node] = self.deltas.get(node, 0.0) + change
+            node += node & -node
+
+    def find(self, target):
+        # Smallest index whose running sum of weights exceeds target
+        position, step = 0, self.top
+        while step:
+            node = position + step
+            if node <= self.size:
+                span = self.default * step + self.deltas.get(node, 0.0)
+                if span <= target:
+                    position = node
+                    target -= span
+            step >>= 1
+        return min(position, self.size - 1)
+
+    def draw(self, rng=random):
+        return self.find(rng.random() * self.total)
+
+class DifficultySampler:
+    def __init__(self, target=None, spread=0.2):
+        # target is the wanted difficulty between 0 (always answered correctly)
+        # and 1 (never); None draws uniformly and only collects statistics
+        self.target = target
+        self.spread = spread
+        self.stats = {}
+        self.trees = {}
+        self.lock = threading.Lock()
+
+    def key(self, question):
+        return (question.category, question.question)
+
+    def difficulty(self, question):
+        return self.smoothed(self.stats.get(self.key(question), (0, 0)))
+
+    def smoothed(self, counts):
+        # Share of wrong answers, smoothed so unseen questions start at 0.5
+        asked, correct = counts
+        return 1 - (correct + 1) / (asked + 2)
+
+    def weight(self, difficulty):
+        distance = difficulty - self.target
+        return math.exp(-distance * distance / (2 * self.spread * self.spread))
+
+    def record(self, question, correct):
+        key = self.key(question)
+        with self.lock:
+            asked, right = self.stats.get(key, (0, 0))
+            self.stats[key] = (asked + 1, right + bool(correct))
+            entry = self.trees.get(question.category)
+            if self.target is not None and entry is not None:
+                self.place(entry, [key])
+
+    def draw(self, cat, questions, rng=random):
+        with self.lock:
+            entry = self.trees.get(cat)
+            if entry is None or entry[0] is not questions:
+                entry = self.trees[cat] = self.tree(cat, questions, entry)
+            questions, tree, positions = entry
+            i = tree.draw(rng)
+            question = questions[i]
+            # Remembered so the answer can update this question's weight
+            positions[self.key(question)] = i
+        return question
+
+    def tree(self, cat, questions, previous):
+        # Every question starts at the weight of an unseen one. Questions
+        # answered from the category's previous list are looked up where they
+        # were; questions[i] is only read for those, so lazy lists (the SQLite
+        # backend) are never loaded in full.
+        tree = WeightTree(len(questions), self.weight(self.smoothed((0, 0))))
+        entry = (questions, tree, {})
+        for key, i in (previous[2].items() if previous else ()):
+            if i < len(questions) and self.key(questions[i]) == key:
+                entry[2][key] = i
+        self.place(entry, [key for key in self.stats if key[0] == cat])
+        return entry
+
+    def place(self, entry, keys):
+        # Sets the weights of answered questions. Answers recorded for
+        # questions this sampler never handed out have no known position; a
+        # plain list is searched once for them, a lazy list skips them.
+        questions, tree, positions = entry
+        missing = {key for key in keys if key not in positions}
+        if missing and isinstance(questions, list):
+            for i, question in enumerate(questions):
+                if self.key(question) in missing:
+                    positions.setdefault(self.key(question), i)
+        for key in keys:
+            if key in positions and key in self.stats:
+                tree.set(positions[key], self.weight(self.smoothed(self.stats[key])))
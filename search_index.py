@@ -0,0 +1,117 @@
+import bisect
+import re
+import threading
+
+# Inverted index over the question bank: every lowercase word of a question's
+# text, answer and category maps to the set of questions containing it. A
+# sorted vocabulary lets prefix terms ("photo*") be resolved with bisect.
+
+TOKEN = re.compile(r"\w+")
+
+
+def tokenize(text):
+    if text is None or text != text:
+        return []
+    return TOKEN.findall(str(text).lower())
+
+
+def parse_query(text, prefix=False):
+    # (term, is_prefix) pairs. A trailing * marks a prefix term; with prefix=True
+    # the last term is also matched as a prefix, for search-as-you-type.
+    terms = []
+    for word in str(text).split():
+        is_prefix = word.endswith('*')
+        terms.extend((token, False) for token in tokenize(word))
+        if terms and is_prefix:
+            terms[-1] = (terms[-1][0], True)
+    if terms and prefix:
+        terms[-1] = (terms[-1][0], True)
+    return terms
+
+
+class SearchIndex:
+    def __init__(self, questions=()):
+        self.postings = {}
+        self.vocabulary = []
+        self.doc_ids = {}
+        self.docs = {}
+        self.next_id = 0
+        self.lock = threading.Lock()
+        # Bulk build: postings first, then one sort of the vocabulary instead
+        # of an insort per new word
+        for question in questions:
+            if question in self.doc_ids:
+                continue
+            doc_id = self.next_id
+            self.next_id += 1
+            self.doc_ids[question] = doc_id
+            self.docs[doc_id] = question
+            for token in self.tokens(question):
+                docs = self.postings.get(token)
+                if docs is None:
+                    docs = self.postings[token] = set()
+                docs.add(doc_id)
+        self.vocabulary = sorted(self.postings)
+
+    def __len__(self):
+        return len(self.docs)
+
+    def add(self, question):
+        with self.lock:
+            if question in self.doc_ids:
+                return
+            doc_id = self.next_id
+            self.next_id += 1
+            self.doc_ids[question] = doc_id
+            self.docs[doc_id] = question
+            for token in self.tokens(question):
+                docs = self.postings.get(token)
+                if docs is None:
+                    docs = self.postings[token] = set()
+                    bisect.insort(self.vocabulary, token)
+                docs.add(doc_id)
+
+    def remove(self, question):
+        with self.lock:
+            doc_id = self.doc_ids.pop(question, None)
+            if doc_id is None:
+                return
+            del self.docs[doc_id]
+            for token in self.tokens(question):
+                docs = self.postings.get(token)
+                if docs is None:
+                    continue
+                docs.discard(doc_id)
+                if not docs:
+                    del self.postings[token]
+                    del self.vocabulary[bisect.bisect_left(self.vocabulary, token)]
+
+    def tokens(self, question):
+        return set(tokenize(question.question) + tokenize(question.answer) + tokenize(question.category))
+
+    def matching(self, term, is_prefix):
+        if not is_prefix:
+            return self.postings.get(term, set())
+        docs = set()
+        start = bisect.bisect_left(self.vocabulary, term)
+        for token in self.vocabulary[start:]:
+            if not token.startswith(term):
+                break
+            docs |= self.postings[token]
+        return docs
+
+    def search(self, text, prefix=False, limit=None):
+        # Questions containing every term, in the order they were added
+        terms = parse_query(text, prefix)
+        if not terms:
+            return []
+        with self.lock:
+            # Intersect from the rarest term so the working set stays small
+            matches = sorted((self.matching(term, is_prefix) for term, is_prefix in terms), key=len)
+            docs = set(matches[0])
+            for other in matches[1:]:
+                docs &= other
+                if not docs:
+                    break
+            results = [self.docs[doc_id] for doc_id in sorted(docs)]
+        return results if limit is None else results[:limit]
@@ -1,9 +1,19 @@
+import hashlib
+import os
 import random
-import pandas as pd
+import threading
 from enum import Enum
+from types import MappingProxyType
 from typing import Self, Union, Set
 
+from media import MEDIA_CACHE
+from question_bank import load_questions
+from sampling import DifficultySampler
+from search_index import SearchIndex
+
 TO_WIN = 4
+QUESTION_FILE = 'question_creator_gui.xlsx'
+MAX_ROLL = 6
 
 class Direction(Enum):
     CLOCKWISE = "CL"
@@ -23,6 +33,15 @@ class Direction(Enum):
         }
         return delta[direction]
 
+OUTSIDE_MOVES = frozenset([Direction.CLOCKWISE, Direction.COUNTER_CLOCKWISE])
+INSIDE_MOVES = frozenset(Direction) - OUTSIDE_MOVES
+OPPOSITE_DIRECTIONS = {
+    Direction.UP: Direction.DOWN,
+    Direction.DOWN: Direction.UP,
+    Direction.LEFT: Direction.RIGHT,
+    Direction.RIGHT: Direction.LEFT,
+}
+
 class Player:
     def __init__(self, name):
         self.name = name
@@ -45,6 +64,8 @@ class Kind(Enum):
 CategoryKind = Union[Kind.CATEGORY1, Kind.CATEGORY2, Kind.CATEGORY3, Kind.CATEGORY4]
 
 class Square:
+    __slots__ = ("index", "y_x", "is_hub", "kind")
+
     def __init__(self, index: int, y_x: tuple, is_hub: bool, kind: Kind):
         self.index = index
         self.y_x = y_x
@@ -56,31 +77,50 @@ class Square:
 
 class Board:
     def __init__(self):
-        self.board_indexes = [
-            [ 1, 2, 3, 4, 5, 6, 7, 8, 9],
-            [32,-1,-1,-1,35,-1,-1,-1,10],
-            [31,-1,-1,-1,36,-1,-1,-1,11],
-            [30,-1,-1,-1,37,-1,-1,-1,12],
-            [29,59,60,61,99,45,44,43,13],
-            [28,-1,-1,-1,53,-1,-1,-1,14],
-            [27,-1,-1,-1,52,-1,-1,-1,15],
-            [26,-1,-1,-1,51,-1,-1,-1,16],
-            [25,24,23,22,21,20,19,18,17],
-        ]
-        self.hubs = [5, 13, 21, 29]
-        self.champion = [99]
-        self.roll_again = [1,9,17,25]
-        self.category1 = [2,6,11,15,20,24,29,35,44,53]
-        self.category2 = [3,7,12,16,21,26,30,36,45,59]
-        self.category3 = [4,8,13,18,22,27,31,37,51,60]
-        self.category4 = [5,10,14,19,23,28,32,43,52,61]
-
-        self.index_map = self.create_index_map()
+        self.board_indexes = (
+            ( 1, 2, 3, 4, 5, 6, 7, 8, 9),
+            (32,-1,-1,-1,35,-1,-1,-1,10),
+            (31,-1,-1,-1,36,-1,-1,-1,11),
+            (30,-1,-1,-1,37,-1,-1,-1,12),
+            (29,59,60,61,99,45,44,43,13),
+            (28,-1,-1,-1,53,-1,-1,-1,14),
+            (27,-1,-1,-1,52,-1,-1,-1,15),
+            (26,-1,-1,-1,51,-1,-1,-1,16),
+            (25,24,23,22,21,20,19,18,17),
+        )
+        self.hubs = (5, 13, 21, 29)
+        self.champion = (99,)
+        self.roll_again = (1,9,17,25)
+        self.category1 = (2,6,11,15,20,24,29,35,44,53)
+        self.category2 = (3,7,12,16,21,26,30,36,45,59)
+        self.category3 = (4,8,13,18,22,27,31,37,51,60)
+        self.category4 = (5,10,14,19,23,28,32,43,52,61)
+        self.spokes = (35,36,37,43,44,45,51,52,53,59,60,61)
+
+        center_directions = {}
+        for hub, spoke, direction in [
+            (5, [35, 36, 37], Direction.DOWN),
+            (13, [43, 44, 45], Direction.LEFT),
+            (21, [51, 52, 53], Direction.UP),
+            (29, [59, 60, 61], Direction.RIGHT),
+        ]:
+            for idx in [hub] + spoke:
+                center_directions[idx] = direction
+        self.center_directions = MappingProxyType(center_directions)
+
+        # The board never changes during play, so lookups are exposed read-only
+        # and a single instance (BOARD) is shared by every Game.
+        self.index_map = MappingProxyType(self.create_index_map())
+        self.transitions = MappingProxyType(self.create_transition_table())
+        self.destinations = MappingProxyType(self.create_destination_table())
 
     def create_index_map(self):
         index_map = {}
         for i, row in enumerate(self.board_indexes):
             for j, idx in enumerate(row):
+                if idx in index_map:
+                    # Every empty cell shares the -1 key; one square stands in for all of them
+                    continue
                 if idx == -1:
                     kind = Kind.EMPTY
                 elif idx in self.champion:
@@ -101,76 +141,353 @@ class Board:
                 index_map[idx] = square
         return index_map
         
+    def create_transition_table(self):
+        # (location, direction, score complete) -> (next location, next direction, stop)
+        transitions = {}
+        for idx, square in self.index_map.items():
+            for complete in (False, True):
+                for direction in Direction:
+                    # Force movement towards the center if the player has more than TO_WIN categories
+                    if complete and square.is_hub:
+                        direction_out = self.center_directions[idx]
+                    else:
+                        direction_out = direction
+
+                    if direction_out == Direction.CLOCKWISE:
+                        location = idx + 1 if idx != 32 else 1
+                    elif direction_out == Direction.COUNTER_CLOCKWISE:
+                        location = idx - 1 if idx != 1 else 32
+                    else:
+                        y, x = square.y_x
+                        dy, dx = Direction.get_delta(direction_out)
+                        new_y, new_x = y + dy, x + dx
+                        if not (0 <= new_y < len(self.board_indexes) and 0 <= new_x < len(self.board_indexes[0])):
+                            # Out of bounds: stay put and end the move
+                            transitions[(idx, direction, complete)] = (idx, direction_out, True)
+                            continue
+                        location = self.board_indexes[new_y][new_x]
+
+                    # Stop at hubs if not moving in the outer ring
+                    stop = location in self.hubs and direction_out not in {Direction.CLOCKWISE, Direction.COUNTER_CLOCKWISE}
+                    transitions[(idx, direction, complete)] = (location, direction_out, stop)
+        return transitions
+
+    def create_destination_table(self):
+        # (location, roll, score complete) -> ((directions, square), ...) for every way the roll can play out
+        destinations = {}
+        for idx in self.index_map:
+            if idx == -1:
+                continue
+            for complete in (False, True):
+                for roll in range(1, MAX_ROLL + 1):
+                    destinations[(idx, roll, complete)] = tuple(self.enumerate_destinations(idx, roll, complete))
+        return destinations
+
+    def enumerate_destinations(self, location, roll, complete):
+        choices = self.available_directions(location, complete)
+        if choices is None:
+            # Predetermined move: complete players head for the center, everyone else away from it
+            direction = self.center_directions[location]
+            if not complete:
+                direction = OPPOSITE_DIRECTIONS[direction]
+            choices = [(None, direction)]
+        else:
+            choices = [(direction, direction) for direction in choices]
+
+        for choice, direction in choices:
+            idx, remaining, stop = location, roll, False
+            while remaining > 0 and not stop:
+                idx, direction, stop = self.transitions[(idx, direction, complete)]
+                remaining -= 1
+
+            if stop and remaining > 0:
+                # Stopped on a hub with pips left over: the player picks a new direction from there
+                for directions, square in self.enumerate_destinations(idx, remaining, complete):
+                    yield (choice,) + directions, square
+            else:
+                yield (choice,), self.index_map[idx]
+
+    def available_directions(self, location, complete):
+        if location in self.spokes:
+            return # predetermined move
+        elif location in self.hubs and complete:
+            return # predetermined move
+        elif location in self.hubs:
+            return OUTSIDE_MOVES
+        elif location in self.champion:
+            return INSIDE_MOVES
+        else:
+            return OUTSIDE_MOVES
+        
     def force_center_direction(self, player: Player):
         if len(player.score) < TO_WIN:
             return
 
-        if player.location in [5,35,36,37]:
-            player.direction = Direction.DOWN
-        if player.location in [13,43,44,45]:
-            player.direction = Direction.LEFT
-        if player.location in [21,51,52,53]:
-            player.direction = Direction.UP
-        if player.location in [29,59,60,61]:
-            player.direction = Direction.RIGHT
+        if player.location in self.center_directions:
+            player.direction = self.center_directions[player.location]
     
     # ------------ KS Changes         
     def move_player(self, player: Player):
-        # Force movement towards the center if the player has more than TO_WIN categories
-        if player.location in self.hubs and len(player.score) >= TO_WIN:
-            self.force_center_direction(player)      
-
-        # Clockwise or counterclockwise movement around the outer ring
-        if player.direction == Direction.CLOCKWISE:
-            player.location = player.location + 1 if player.location != 32 else 1
-        elif player.direction == Direction.COUNTER_CLOCKWISE:
-            player.location = player.location - 1 if player.location != 1 else 32
-        else:
-            # Endgame logic: moving towards the center
-            y, x = [v.y_x for v in self.index_map.values() if v.index == player.location][0]
-            dy, dx = Direction.get_delta(player.direction)
-            new_y, new_x = y + dy, x + dx
-
-            # Boundary check to prevent IndexError
-            if 0 <= new_y < len(self.board_indexes) and 0 <= new_x < len(self.board_indexes[0]):
-                player.location = self.board_indexes[new_y][new_x]
-            else:
-                print("Invalid move: out of bounds")
-                return "STOP"
-            
-        # Stop at hubs if not moving in the outer ring
-        if player.location in self.hubs and player.direction not in {Direction.CLOCKWISE, Direction.COUNTER_CLOCKWISE}:
+        location, player.direction, stop = self.transitions[(player.location, player.direction, len(player.score) >= TO_WIN)]
+
+        if stop and location == player.location:
+            print("Invalid move: out of bounds")
+            return "STOP"
+
+        player.location = location
+        if stop:
             return "STOP"
 
         print(f"Player moved to location {player.location}")
         return player.location
 
+BOARD = Board()
+
 
 class Question:
-    def __init__(self, category, question, answer):
+    def __init__(self, category, question, answer, media=None):
         self.category = category
         self.question = question
         self.answer = answer
-        self.media = None
+        self.media_ref = media
+
+    @property
+    def media(self):
+        # Only the path is kept in the bank; the asset is read when first asked for
+        if not self.media_ref:
+            return None
+        return MEDIA_CACHE.get(self.media_ref)
+
+class Deck:
+    # Lazy Fisher-Yates shuffle over a shared question list. Only the swapped
+    # positions are stored, so a deck costs O(questions drawn), never a copy.
+    __slots__ = ("questions", "size", "swaps", "remaining", "upcoming")
+
+    def __init__(self, questions):
+        self.questions = questions
+        self.size = len(questions)
+        self.swaps = {}
+        self.remaining = self.size
+        self.upcoming = None
+
+    @classmethod
+    def restore(cls, size, remaining, swaps, upcoming=None):
+        # A deck saved in a snapshot; it gets its question list back on the next draw
+        deck = cls(())
+        deck.questions = None
+        deck.size = size
+        deck.remaining = remaining
+        deck.swaps = dict(swaps)
+        deck.upcoming = upcoming
+        return deck
+
+    def adopt(self, questions):
+        # Takes the list of a restored deck, if it is still the same length
+        if self.questions is None and self.size == len(questions):
+            self.questions = questions
+            return True
+        return False
+
+    def peek(self, rng=random):
+        # Decide the next draw now so its media can be loaded ahead of time
+        if self.upcoming is None:
+            self.upcoming = self.pick(rng)
+        return self.questions[self.upcoming]
+
+    def draw(self, rng=random):
+        question = self.peek(rng)
+        self.upcoming = None
+        return question
+
+    def pick(self, rng):
+        if self.remaining == 0:
+            # Every question has been asked once: reshuffle
+            self.swaps.clear()
+            self.remaining = len(self.questions)
+        i = rng.randrange(self.remaining)
+        last = self.remaining - 1
+        pick = self.swaps.get(i, i)
+        self.swaps[i] = self.swaps.pop(last, last)
+        self.remaining = last
+        return pick
+
+def same_answer(a, b):
+    # Empty spreadsheet cells come back as NaN, which never equals itself
+    return a == b or (a != a and b != b)
 
 class QuestionRetriever:
-    def __init__(self):
-        self.table = pd.read_excel('question_creator_gui.xlsx')[["Question", "Answer", "Category"]]
+    def __init__(self, rows=None, path=QUESTION_FILE, dedup=None, target_difficulty=None):
+        # rows are (question, answer, category) tuples; by default they are
+        # loaded from the spreadsheet (or its cache) at path. dedup="report"
+        # lists near-duplicate questions on load and dedup="collapse" also
+        # keeps only the first question of each cluster. With a
+        # target_difficulty (0 easy to 1 hard) draws are weighted toward
+        # questions answered correctly that often instead of using decks.
+        self.sampler = DifficultySampler(target_difficulty)
+        self.path = None
+        self.signature = None
+        self.dedup = dedup
+        self.duplicate_clusters = []
+        if rows is None:
+            self.path = path
+            self.signature = self.file_signature()
+            rows = load_questions(path)
+        self.bank = self.index_questions(self.deduplicate(rows))
+        self.search_index = SearchIndex(q for questions in self.bank.values() for q in questions)
+        self.categories = []
+        self.question_bank = {}
+        self.decks = {}
+        self.reload_lock = threading.Lock()
+        self.watcher = None
+        self.stop_event = threading.Event()
+
+    def index_questions(self, rows):
+        # A single pass builds every category's question list up front
+        bank = {}
+        for cat, pairs in self.group_rows(rows).items():
+            bank[cat] = [Question(cat, q, a, m) for q, a, m in pairs]
+        return bank
+
+    def deduplicate(self, rows):
+        if not self.dedup:
+            return rows
+        from dedup import collapse, find_duplicates, report
+        rows = list(rows)
+        self.duplicate_clusters = find_duplicates(rows)
+        report(rows, self.duplicate_clusters)
+        if self.dedup == 'collapse':
+            return collapse(rows, self.duplicate_clusters)
+        return rows
+
+    def group_rows(self, rows):
+        # category -> [(question, answer, media), ...] in spreadsheet order; rows without a category are skipped
+        groups = {}
+        for row in rows:
+            question, answer, cat = row[:3]
+            if cat is None or cat != cat:
+                continue
+            groups.setdefault(cat, []).append((question, answer, row[3] if len(row) > 3 else None))
+        return groups
 
     def get_categories_excel(self):
-        return self.table['Category'].unique().tolist()
+        return list(self.bank)
     
     def set_categories(self, categories):
         self.categories = categories
         
+        self.decks = {}
         self.question_bank = {}
         for cat in self.categories:
-            self.question_bank[cat] = [Question(cat, x["Question"], x["Answer"]) for _, x in self.table.iterrows() if x['Category'] == cat]
+            self.question_bank[cat] = self.bank.get(cat, [])
             print(f"Loaded {len(self.question_bank[cat])} questions for category: {cat}")
-            
-        print(self.question_bank)
-            
-    def get_question(self, category: Kind):
+
+    def file_signature(self):
+        stat = os.stat(self.path)
+        return (stat.st_size, stat.st_mtime_ns)
+
+    def reload(self):
+        # Re-read the spreadsheet and swap in the new per-category lists in one
+        # assignment. Unchanged categories keep their list and unchanged rows keep
+        # their Question object, so games in progress keep drawing without a pause.
+        with self.reload_lock:
+            signature = self.file_signature()
+            groups = self.group_rows(self.deduplicate(load_questions(self.path)))
+            diff = {'added': 0, 'removed': 0, 'changed': 0}
+
+            bank = {}
+            for cat, pairs in groups.items():
+                old = self.bank.get(cat, [])
+                questions = self.diff_category(cat, old, pairs, diff)
+                unchanged = len(questions) == len(old) and all(q is o for q, o in zip(questions, old))
+                bank[cat] = old if unchanged else questions
+            for cat, old in self.bank.items():
+                if cat not in bank:
+                    diff['removed'] += len(old)
+
+            old_questions = {q for questions in self.bank.values() for q in questions}
+            new_questions = {q for questions in bank.values() for q in questions}
+            for q in old_questions - new_questions:
+                self.search_index.remove(q)
+            for cat in bank:
+                for q in bank[cat]:
+                    if q not in old_questions:
+                        self.search_index.add(q)
+
+            self.bank = bank
+            self.question_bank = {cat: bank.get(cat, []) for cat in self.categories}
+            self.signature = signature
+
+        print(f"Reloaded question bank: {diff['added']} added, {diff['removed']} removed, {diff['changed']} changed")
+        return diff
+
+    def diff_category(self, cat, old, rows, diff):
+        existing = {}
+        for q in old:
+            existing.setdefault(q.question, []).append(q)
+
+        questions = []
+        for question, answer, media in rows:
+            matches = existing.get(question)
+            if not matches:
+                q = Question(cat, question, answer, media)
+                diff['added'] += 1
+            else:
+                q = matches.pop(0)
+                if not same_answer(q.answer, answer) or q.media_ref != media:
+                    q = Question(cat, question, answer, media)
+                    diff['changed'] += 1
+            questions.append(q)
+
+        diff['removed'] += sum(len(matches) for matches in existing.values())
+        return questions
+
+    def add_rows(self, rows):
+        # Appends a chunk of (question, answer, category[, media]) rows, e.g.
+        # from importer.feed_retriever. Decks pick new questions up on reshuffle.
+        with self.reload_lock:
+            for cat, triples in self.group_rows(rows).items():
+                questions = [Question(cat, q, a, m) for q, a, m in triples]
+                if cat in self.bank:
+                    self.bank[cat].extend(questions)
+                else:
+                    self.bank[cat] = questions
+                for q in questions:
+                    self.search_index.add(q)
+            self.question_bank = {cat: self.bank.get(cat, []) for cat in self.categories}
+
+    def record_answer(self, question, correct):
+        self.sampler.record(question, correct)
+
+    def search(self, text, prefix=False, limit=None):
+        # Keyword search over question text, answers and categories; "term*"
+        # matches a prefix, and prefix=True treats the last word as one
+        return self.search_index.search(text, prefix, limit)
+
+    def watch(self, interval=1.0):
+        # Poll the spreadsheet in the background and reload it when it changes
+        if self.path is None or self.watcher is not None:
+            return
+        self.stop_event.clear()
+        self.watcher = threading.Thread(target=self.watch_file, args=(interval,), daemon=True)
+        self.watcher.start()
+
+    def stop_watching(self):
+        if self.watcher is None:
+            return
+        self.stop_event.set()
+        self.watcher.join()
+        self.watcher = None
+
+    def watch_file(self, interval):
+        while not self.stop_event.wait(interval):
+            try:
+                if self.file_signature() != self.signature:
+                    self.reload()
+            except Exception as e:
+                # Usually the file is mid-save; try again on the next tick
+                print(f"Could not reload question bank: {e}")
+
+    def get_question(self, category: Kind, decks=None, rng=random):
         cat_str = None
         if category == Kind.CATEGORY1:
             cat_str = self.categories[0]
@@ -182,7 +499,20 @@ class QuestionRetriever:
             cat_str = self.categories[3]
         if cat_str not in self.question_bank or not self.question_bank[cat_str]:
             raise Exception(f"No questions available for category: {cat_str}")
-        return random.choice(self.question_bank[cat_str])
+        return self.draw(cat_str, self.decks if decks is None else decks, rng)
+
+    def draw(self, cat_str, decks, rng=random):
+        # decks holds one Deck per category for a single game; a deck is
+        # restarted whenever its category's list has been replaced by a reload
+        questions = self.question_bank[cat_str]
+        if self.sampler.target is not None:
+            return self.sampler.draw(cat_str, questions, rng)
+        deck = decks.get(cat_str)
+        if deck is None or (deck.questions is not questions and not deck.adopt(questions)):
+            deck = decks[cat_str] = Deck(questions)
+        question = deck.draw(rng)
+        MEDIA_CACHE.prefetch(deck.peek(rng).media_ref)
+        return question
 
 class State(Enum):
     ROLL = "ROLL"
@@ -190,12 +520,35 @@ class State(Enum):
     QUESTION = "QUESTION"
     VERIFY = "VERIFY"
     
+def derive_seed(seed, *keys):
+    # Seed of an independent sub-stream of a master seed, e.g. (seed, game, 'dice')
+    digest = hashlib.blake2b(repr((seed,) + keys).encode(), digest_size=8).digest()
+    return int.from_bytes(digest, 'little')
+
 class Game:
-    def __init__(self, players):
-        self.board = Board()
+    def __init__(self, players, rng=None, question_rng=None):
+        # rng drives the dice and is saved in snapshots; question_rng only
+        # shuffles the decks, so question draws never shift the dice
+        self.board = BOARD
+        self.rng = rng if rng is not None else random.Random()
+        self.question_rng = question_rng if question_rng is not None else random.Random()
+        self.decks = {}
+        self.question = None
         self.set_players(players)
         self.state = State.ROLL
         self.turn = 0
+        self.roll = 0
+
+    @classmethod
+    def restore(cls, names, state, turn, roll, rng=None, question_rng=None, decks=None):
+        # A game at a saved point (see snapshot.py); players' positions and
+        # tokens are set on game.players afterwards
+        game = cls(names, rng, question_rng)
+        game.state = state
+        game.turn = turn
+        game.roll = roll
+        game.decks = dict(decks or {})
+        return game
     
     def set_players(self, players):
         print("setting players!")
@@ -219,7 +572,7 @@ class Game:
             return(True)
 
     def roll_dice(self) -> int:
-        self.roll = random.randint(1, 6)        
+        self.roll = self.rng.randint(1, MAX_ROLL)
         # Used for testing final roll
         # self.roll = 4
         self.state = State.MOVE
@@ -264,9 +617,15 @@ class Game:
         return self
 
 class TrivialComputeServer:
-    def __init__(self):
-        self.question_retriever = QuestionRetriever()
+    def __init__(self, question_retriever=None, seed=None):
+        # Any QuestionRetriever backend can be passed in, e.g. SQLiteQuestionRetriever.
+        # With a seed, the n-th game started plays out identically on every run.
+        self.question_retriever = question_retriever or QuestionRetriever()
+        self.seed = seed
+        self.games_started = 0
         self.player_order = []
+        # Optional event_log.GameLog recording every state change of the game
+        self.event_log = None
         
     def set_player_order(self, order):
         self.player_order = list(order)
@@ -279,14 +638,23 @@ class TrivialComputeServer:
             return current_player
 
     def start_game(self, players, categories):
-        self.game = Game(players)
+        if self.seed is None:
+            self.game = Game(players)
+        else:
+            self.game = Game(players, random.Random(derive_seed(self.seed, self.games_started, 'dice')),
+                             random.Random(derive_seed(self.seed, self.games_started, 'questions')))
+        self.games_started += 1
         self.categories = categories
         self.question_retriever.set_categories(categories)
+        if self.event_log is not None:
+            self.event_log.start(self.game, categories)
         print(f"Server starting game with categories: {categories}")
         return self.game
     
     def set_order(self, players):
         self.game.set_players(players)
+        if self.event_log is not None:
+            self.event_log.start(self.game, self.categories)
         
         return self.game
 
@@ -297,30 +665,34 @@ class TrivialComputeServer:
         if(not self.game.state_check(State.ROLL)):
             return -1
         
-        return self.game.roll_dice()
+        roll = self.game.roll_dice()
+        if self.event_log is not None:
+            self.event_log.record_roll(self.game, roll)
+        return roll
     
     def get_available_directions(self):
-        loc = self.game.active_square()
-        
-        outside_moves = set([Direction.CLOCKWISE, Direction.COUNTER_CLOCKWISE])
-        inside_moves = set(Direction) - outside_moves
-        
-        if loc.index in [35,36,37,43,44,45,51,52,53,59,60,61]:
-            return # predetermined move
-        elif loc.is_hub and len(self.game.active_player().score) >= TO_WIN:
+        player = self.game.active_player()
+        dirs = self.game.board.available_directions(player.location, len(player.score) >= TO_WIN)
+        if dirs is None:
             return # predetermined move
-        elif loc.is_hub:
-            return outside_moves
-        elif loc.index in [99]:
-            return inside_moves
-        else:
-            return outside_moves
+        return set(dirs)
+
+    def get_destinations(self):
+        # Every square the current roll can end on, with the direction choices that lead there
+        if(not self.game.state_check(State.MOVE) or self.game.roll <= 0):
+            return -1
+
+        player = self.game.active_player()
+        return self.game.board.destinations[(player.location, self.game.roll, len(player.score) >= TO_WIN)]
     
     def move(self, direction: Direction = None):
         if(not self.game.state_check(State.MOVE) or self.game.roll <= 0):
             return -1
 
-        return self.game.move(direction)
+        game = self.game.move(direction)
+        if self.event_log is not None:
+            self.event_log.record_move(game, direction)
+        return game
     
     # --------- KS Changes
     def get_question(self, category=None):
@@ -333,7 +705,8 @@ class TrivialComputeServer:
             if not questions:
                 raise ValueError(f"No questions available for category: {category}")
             
-            return random.choice(questions)
+            self.game.question = self.question_retriever.draw(category, self.game.decks, self.game.question_rng)
+            return self.game.question
         
         # If no category is specified, use existing logic to retrieve a question based on the player's current square
         if not self.game.state_check(State.QUESTION):
@@ -343,10 +716,21 @@ class TrivialComputeServer:
         if active_square.kind not in [Kind.CATEGORY1, Kind.CATEGORY2, Kind.CATEGORY3, Kind.CATEGORY4]:
             raise Exception("No category for active square!")
         
-        return self.question_retriever.get_question(active_square.kind) 
+        self.game.question = self.question_retriever.get_question(active_square.kind, self.game.decks, self.game.question_rng)
+        return self.game.question
 
     def verify_question(self, correct):
-        return self.game.verify_question(correct)
+        # Feed the result back into the per-question difficulty statistics
+        if self.game.question is not None:
+            self.question_retriever.record_answer(self.game.question, correct)
+            self.game.question = None
+        game = self.game.verify_question(correct)
+        if self.event_log is not None:
+            self.event_log.record_verify(game, correct)
+        return game
+
+    def search_questions(self, text, prefix=False, limit=None):
+        return self.question_retriever.search(text, prefix, limit)
     
     def get_score(self, player):
         score = []
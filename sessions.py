@@ -0,0 +1,275 @@
+import contextlib
+import itertools
+import os
+import sys
+import threading
+import time
+
+from event_log import GameLog, replay
+from server import QUESTION_FILE, TrivialComputeServer, derive_seed
+from snapshot import check_players
+
+# Many concurrent games in one process. Every game gets its own
+# TrivialComputeServer and lock, registered under a game id; the usual server
+# calls take the id first and are routed to that game. By default each game's
+# retriever is a ShardedQuestionRetriever, so games only hold their four
+# category shards and share them with every other game that picked them.
+
+IDLE_TIMEOUT = 30 * 60
+
+
+class UnknownGameError(KeyError):
+    pass
+
+
+class Session:
+    __slots__ = ("game_id", "server", "lock", "created", "last_active")
+
+    def __init__(self, game_id, server, now):
+        self.game_id = game_id
+        self.server = server
+        # Reentrant so a batch of actions can hold it across several calls
+        self.lock = threading.RLock()
+        self.created = now
+        self.last_active = now
+
+
+def sharded_retriever(path=QUESTION_FILE):
+    from shards import ShardedQuestionRetriever
+    return ShardedQuestionRetriever(path)
+
+
+def object_size(obj):
+    # Shallow size plus the per-game containers hanging off it
+    size = sys.getsizeof(obj)
+    if isinstance(obj, dict):
+        size += sum(sys.getsizeof(k) + sys.getsizeof(v) for k, v in obj.items())
+    elif isinstance(obj, (list, tuple, set, frozenset)):
+        size += sum(sys.getsizeof(item) for item in obj)
+    return size
+
+
+def index_size(index):
+    # A SearchIndex: its postings sets, the vocabulary and the id maps
+    size = sys.getsizeof(index) + object_size(index.postings) + object_size(index.vocabulary)
+    size += sum(sys.getsizeof(docs) for docs in index.postings.values())
+    return size + object_size(index.doc_ids) + object_size(index.docs)
+
+
+class SessionManager:
+    def __init__(self, retriever_factory=sharded_retriever, idle_timeout=IDLE_TIMEOUT, clock=time.monotonic, log_directory=None, seed=None):
+        # With a log_directory every game keeps an event log there, and
+        # evicted or crashed games can be brought back with recover_game.
+        # With a seed, each game's dice and questions follow from its game id.
+        self.retriever_factory = retriever_factory
+        self.seed = seed
+        self.log_directory = log_directory
+        self.idle_timeout = idle_timeout
+        self.clock = clock
+        self.sessions = {}
+        self.starting = set()
+        self.lock = threading.Lock()
+        self.ids = itertools.count(1)
+        self.reaper = None
+        self.stop_event = threading.Event()
+
+    def __len__(self):
+        return len(self.sessions)
+
+    def __contains__(self, game_id):
+        return game_id in self.sessions
+
+    def start_game(self, players, categories, game_id=None):
+        if self.log_directory is not None:
+            # Before anything is created, so a game that could not be logged leaves nothing behind
+            check_players(players)
+        server = TrivialComputeServer(self.retriever_factory())
+        game_id = self.reserve(server, game_id)
+        try:
+            if self.seed is not None:
+                server.seed = derive_seed(self.seed, game_id)
+            if self.log_directory is not None:
+                server.event_log = GameLog(self.log_path(game_id))
+            server.start_game(players, categories)
+        except BaseException:
+            self.discard(game_id, server)
+            raise
+        self.publish(game_id, server)
+        return game_id
+
+    def recover_game(self, game_id):
+        # Rebuilds a game from its event log, e.g. after the process restarted
+        if self.log_directory is None or not os.path.exists(self.log_path(game_id)):
+            raise UnknownGameError(game_id)
+        server = TrivialComputeServer(self.retriever_factory())
+        self.reserve(server, game_id)
+        try:
+            # Opening the log first cuts off a record torn by a crash
+            server.event_log = GameLog(self.log_path(game_id))
+            game, meta, _ = replay(self.log_path(game_id))
+            server.categories = meta['categories']
+            server.question_retriever.set_categories(server.categories)
+            server.game = game
+        except BaseException:
+            self.discard(game_id, server)
+            raise
+        self.publish(game_id, server)
+        return game_id
+
+    def reserve(self, server, game_id):
+        # Claims a game id while the game is set up. The game is only
+        # published once it is ready, so until then it is simply unknown
+        # instead of making callers wait on its lock.
+        with self.lock:
+            if game_id is None:
+                game_id = next(self.ids)
+                while game_id in self.sessions or game_id in self.starting:
+                    game_id = next(self.ids)
+            elif game_id in self.sessions or game_id in self.starting:
+                self.close_server(server)
+                raise ValueError(f"Game {game_id} already exists")
+            self.starting.add(game_id)
+        return game_id
+
+    def publish(self, game_id, server):
+        with self.lock:
+            self.starting.discard(game_id)
+            self.sessions[game_id] = Session(game_id, server, self.clock())
+
+    def discard(self, game_id, server):
+        with self.lock:
+            self.starting.discard(game_id)
+        self.close_server(server)
+
+    def log_path(self, game_id):
+        return os.path.join(self.log_directory, f"{game_id}.log")
+
+    def session(self, game_id):
+        session = self.sessions.get(game_id)
+        if session is None:
+            raise UnknownGameError(game_id)
+        return session
+
+    @contextlib.contextmanager
+    def locked(self, game_id):
+        # The game's session with its lock held. The game may be ended or
+        # evicted while waiting for the lock, so it is looked up again after.
+        session = self.session(game_id)
+        with session.lock:
+            if self.sessions.get(game_id) is not session:
+                raise UnknownGameError(game_id)
+            yield session
+
+    def call(self, game_id, method, *args):
+        # Calls on one game are serialized; different games run in parallel
+        with self.locked(game_id) as session:
+            session.last_active = self.clock()
+            return getattr(session.server, method)(*args)
+
+    def game(self, game_id):
+        return self.session(game_id).server.game
+
+    def roll(self, game_id):
+        return self.call(game_id, 'roll')
+
+    def get_available_directions(self, game_id):
+        return self.call(game_id, 'get_available_directions')
+
+    def get_destinations(self, game_id):
+        return self.call(game_id, 'get_destinations')
+
+    def move(self, game_id, direction=None):
+        return self.call(game_id, 'move', direction)
+
+    def get_question(self, game_id, category=None):
+        return self.call(game_id, 'get_question', category)
+
+    def verify_question(self, game_id, correct):
+        return self.call(game_id, 'verify_question', correct)
+
+    def get_score(self, game_id, player):
+        return self.call(game_id, 'get_score', player)
+
+    def end_game(self, game_id):
+        with self.lock:
+            session = self.sessions.pop(game_id, None)
+        if session is None:
+            raise UnknownGameError(game_id)
+        with session.lock:
+            self.close_server(session.server)
+
+    def close_server(self, server):
+        # Hands shared shards back so they can be evicted once no game uses them
+        close = getattr(server.question_retriever, 'close', None)
+        if close is not None:
+            close()
+        if server.event_log is not None:
+            server.event_log.close()
+            server.event_log = None
+
+    def evict_idle(self):
+        # Ends every game with no calls for idle_timeout seconds; games in the
+        # middle of a call are left for the next pass
+        now = self.clock()
+        evicted = []
+        with self.lock:
+            for game_id, session in list(self.sessions.items()):
+                if now - session.last_active < self.idle_timeout or not session.lock.acquire(blocking=False):
+                    continue
+                del self.sessions[game_id]
+                evicted.append(session)
+                session.lock.release()
+        for session in evicted:
+            with session.lock:
+                self.close_server(session.server)
+        return [session.game_id for session in evicted]
+
+    def start_reaper(self, interval=60.0):
+        if self.reaper is not None:
+            return
+        self.stop_event.clear()
+        self.reaper = threading.Thread(target=self.reap, args=(interval,), daemon=True)
+        self.reaper.start()
+
+    def stop_reaper(self):
+        if self.reaper is None:
+            return
+        self.stop_event.set()
+        self.reaper.join()
+        self.reaper = None
+
+    def reap(self, interval):
+        while not self.stop_event.wait(interval):
+            evicted = self.evict_idle()
+            if evicted:
+                print(f"Evicted {len(evicted)} idle games")
+
+    def memory_usage(self, game_id):
+        # Approximate bytes owned by one game. Shards, their search indexes
+        # and the board are shared between games and are not counted; a
+        # retriever with its own search index (a plain QuestionRetriever) is
+        # charged for it.
+        with self.locked(game_id) as session:
+            server = session.server
+            game = server.game
+            size = sys.getsizeof(session) + object_size(server.__dict__) + object_size(game.__dict__)
+            size += object_size(game.players)
+            for player in game.players:
+                size += object_size(player.__dict__) + object_size(player.score)
+            for deck in game.decks.values():
+                size += sys.getsizeof(deck) + object_size(deck.swaps)
+            retriever = server.question_retriever
+            size += object_size(retriever.categories) + object_size(retriever.question_bank)
+            size += object_size(retriever.sampler.stats)
+            if getattr(retriever, 'search_index', None) is not None:
+                size += index_size(retriever.search_index)
+        return size
+
+    def memory_report(self):
+        report = {}
+        for game_id in list(self.sessions):
+            try:
+                report[game_id] = self.memory_usage(game_id)
+            except UnknownGameError:
+                continue  # ended while the report was being built
+        return report
@@ -0,0 +1,226 @@
+import json
+import os
+import pickle
+import re
+import threading
+import time
+from collections import OrderedDict
+
+from question_bank import CACHE_VERSION, file_digest, load_questions, path_lock, temp_path
+from search_index import SearchIndex
+from server import QUESTION_FILE, Question, QuestionRetriever
+from sampling import DifficultySampler
+
+# The bank split into one shard file per category plus a small manifest.
+# Listing categories reads only the manifest, and a game loads just the shards
+# for the four categories it picked. Loaded shards live in a process-wide
+# cache shared by every retriever, reference counted so shards no game is
+# using can be evicted. A shard's search index is built the first time a game
+# searches it and is shared the same way.
+
+SHARD_SUFFIX = '.shards'
+MANIFEST = 'manifest.json'
+IDLE_SHARDS = 8
+MANIFEST_TTL = 1.0
+
+
+def shard_directory(path):
+    return path + SHARD_SUFFIX
+
+
+def read_manifest(directory):
+    try:
+        with open(os.path.join(directory, MANIFEST), encoding='utf-8') as f:
+            manifest = json.load(f)
+    except (OSError, ValueError):
+        return None
+    return manifest if manifest.get('version') == CACHE_VERSION else None
+
+
+def write_shards(directory, groups, meta, cache=None):
+    # groups is category -> [(question, answer, media), ...]; the manifest is
+    # replaced last so readers never see it point at missing shards
+    os.makedirs(directory, exist_ok=True)
+    categories = []
+    for i, (category, rows) in enumerate(groups.items()):
+        slug = re.sub(r"[^\w-]+", '_', str(category))[:40]
+        name = f"{i:04d}-{slug}-{meta['sha256'][:12]}.shard"
+        tmp_path = temp_path(os.path.join(directory, name))
+        with open(tmp_path, 'wb') as f:
+            pickle.dump(rows, f, protocol=pickle.HIGHEST_PROTOCOL)
+        os.replace(tmp_path, os.path.join(directory, name))
+        categories.append({'name': category, 'file': name, 'count': len(rows)})
+
+    manifest = write_manifest(directory, dict(meta, version=CACHE_VERSION, categories=categories))
+
+    # Shards from older builds are left for games still holding them until the next build
+    current = {entry['file'] for entry in categories} | {MANIFEST}
+    for name in os.listdir(directory):
+        if name.endswith('.shard') and name not in current and not (cache or SHARD_CACHE).is_loaded(os.path.join(directory, name)):
+            os.remove(os.path.join(directory, name))
+    return manifest
+
+
+def write_manifest(directory, manifest):
+    tmp_path = temp_path(os.path.join(directory, MANIFEST))
+    with open(tmp_path, 'w', encoding='utf-8') as f:
+        json.dump(manifest, f)
+    os.replace(tmp_path, os.path.join(directory, MANIFEST))
+    return manifest
+
+
+def prepare_shards(path, group_rows, cache=None):
+    # Manifest of an up to date shard directory for the spreadsheet at path
+    with path_lock(path):
+        return build_manifest(path, group_rows, cache)
+
+
+def build_manifest(path, group_rows, cache):
+    directory = shard_directory(path)
+    stat = os.stat(path)
+    manifest = read_manifest(directory)
+    if manifest and (manifest['size'], manifest['mtime_ns']) == (stat.st_size, stat.st_mtime_ns):
+        return manifest
+
+    digest = file_digest(path)
+    if manifest and manifest['sha256'] == digest:
+        # Touched but not changed: record the new stat so the next check is cheap again
+        return write_manifest(directory, dict(manifest, size=stat.st_size, mtime_ns=stat.st_mtime_ns))
+
+    meta = {'size': stat.st_size, 'mtime_ns': stat.st_mtime_ns, 'sha256': digest}
+    return write_shards(directory, group_rows(load_questions(path)), meta, cache)
+
+
+class ShardCache:
+    def __init__(self, idle=IDLE_SHARDS):
+        self.idle = idle
+        self.loaded = {}
+        self.indexes = {}
+        self.manifests = {}
+        self.refs = {}
+        self.unused = OrderedDict()
+        self.lock = threading.Lock()
+
+    def manifest(self, path, group_rows, refresh=False):
+        # (file signature, manifest) for the spreadsheet at path, shared by
+        # every retriever. The file is checked again at most every MANIFEST_TTL
+        # seconds, so starting a game normally touches no files at all.
+        entry = self.manifests.get(path)
+        if entry is None or refresh or time.monotonic() - entry[0] >= MANIFEST_TTL:
+            with path_lock(path):
+                # Another thread may have checked the file while this one waited
+                if self.manifests.get(path) is entry:
+                    stat = os.stat(path)
+                    self.manifests[path] = (time.monotonic(), (stat.st_size, stat.st_mtime_ns),
+                                            prepare_shards(path, group_rows, self))
+                entry = self.manifests[path]
+        return entry[1], entry[2]
+
+    def is_loaded(self, shard_path):
+        return shard_path in self.loaded
+
+    def acquire(self, shard_path, category):
+        with self.lock:
+            questions = self.loaded.get(shard_path)
+            if questions is None:
+                with open(shard_path, 'rb') as f:
+                    rows = pickle.load(f)
+                questions = self.loaded[shard_path] = [Question(category, q, a, m) for q, a, m in rows]
+            self.refs[shard_path] = self.refs.get(shard_path, 0) + 1
+            self.unused.pop(shard_path, None)
+            return questions
+
+    def search_index(self, shard_path):
+        # Built outside the lock so other games can acquire shards meanwhile;
+        # the caller holds a reference, so the shard stays loaded
+        index = self.indexes.get(shard_path)
+        if index is None:
+            index = SearchIndex(self.loaded[shard_path])
+            with self.lock:
+                index = self.indexes.setdefault(shard_path, index)
+        return index
+
+    def release(self, shard_path):
+        with self.lock:
+            self.refs[shard_path] -= 1
+            if self.refs[shard_path] > 0:
+                return
+            del self.refs[shard_path]
+            # Keep a few unused shards around in case the next game picks them again
+            self.unused[shard_path] = True
+            while len(self.unused) > self.idle:
+                evicted, _ = self.unused.popitem(last=False)
+                del self.loaded[evicted]
+                self.indexes.pop(evicted, None)
+
+
+SHARD_CACHE = ShardCache()
+
+
+class ShardedQuestionRetriever(QuestionRetriever):
+    def __init__(self, path=QUESTION_FILE, target_difficulty=None, cache=SHARD_CACHE):
+        self.sampler = DifficultySampler(target_difficulty)
+        self.path = path
+        self.cache = cache
+        self.categories = []
+        self.question_bank = {}
+        self.decks = {}
+        self.held = {}
+        self.bank = {}
+        self.reload_lock = threading.Lock()
+        self.watcher = None
+        self.stop_event = threading.Event()
+
+        self.signature, self.manifest = cache.manifest(path, self.group_rows)
+
+    def get_categories_excel(self):
+        return [entry['name'] for entry in self.manifest['categories']]
+
+    def set_categories(self, categories):
+        self.categories = categories
+        self.decks = {}
+        self.swap_shards()
+        for cat in self.categories:
+            print(f"Loaded {len(self.question_bank[cat])} questions for category: {cat}")
+
+    def swap_shards(self):
+        # Acquire the new shards before releasing the old ones so shards that
+        # stay selected are never evicted in between
+        entries = {entry['name']: entry for entry in self.manifest['categories']}
+        directory = shard_directory(self.path)
+        held = {}
+        bank = {}
+        for cat in self.categories:
+            if cat in entries:
+                held[cat] = os.path.join(directory, entries[cat]['file'])
+                bank[cat] = self.cache.acquire(held[cat], cat)
+        for shard_path in self.held.values():
+            self.cache.release(shard_path)
+        self.held = held
+        self.bank = bank
+        self.question_bank = {cat: bank.get(cat, []) for cat in self.categories}
+
+    def add_rows(self, rows):
+        # The question lists are the shard cache's, shared with every other game
+        raise NotImplementedError("Sharded question banks are read-only; add the rows to the spreadsheet instead")
+
+    def search(self, text, prefix=False, limit=None):
+        # Search covers the categories in play, since that is all that is loaded
+        results = []
+        for cat in self.categories:
+            if cat in self.held:
+                results.extend(self.cache.search_index(self.held[cat]).search(text, prefix, limit))
+            if limit is not None and len(results) >= limit:
+                return results[:limit]
+        return results
+
+    def close(self):
+        self.categories = []
+        self.swap_shards()
+
+    def reload(self):
+        with self.reload_lock:
+            signature, self.manifest = self.cache.manifest(self.path, self.group_rows, refresh=True)
+            self.swap_shards()
+            self.signature = signature
+        print(f"Reloaded question shards for {self.path}")
@@ -0,0 +1,146 @@
+import argparse
+import contextlib
+import io
+import multiprocessing
+import os
+import random
+import statistics
+import sys
+import time
+
+from server import TO_WIN, Kind, QuestionRetriever, State, TrivialComputeServer, derive_seed
+
+# Monte Carlo runner for rule and balance analysis. Games are split into
+# chunks; each chunk is played by a seeded TrivialComputeServer in a worker
+# process, and only a small tuple of statistics per game comes back. Chunk
+# seeds depend on the chunk index alone, so the report is the same for any
+# number of workers.
+
+CHUNK_SIZE = 500
+MAX_ROLLS = 2000
+CENTER = 99
+STATES = tuple(State)
+STATE_CODES = {state: code for code, state in enumerate(STATES)}
+CATEGORY_KINDS = (Kind.CATEGORY1, Kind.CATEGORY2, Kind.CATEGORY3, Kind.CATEGORY4)
+CATEGORIES = [f"Category {i}" for i in range(1, 5)]
+
+
+def synthetic_bank(categories=CATEGORIES, per_category=50):
+    # Question text never changes an outcome, so a small generated bank will do
+    return [(f"{cat} question {i}", f"Answer {i}", cat) for cat in categories for i in range(per_category)]
+
+
+def play_game(server, names, categories, rng, correct_rate=0.5, max_rolls=MAX_ROLLS):
+    # (rolls, winner seat or -1, rolls per player, steps spent in each State).
+    # Players pick directions at random and answer correctly with correct_rate.
+    game = server.start_game(names, categories)
+    rolls = [0] * len(names)
+    steps = [0] * len(STATES)
+    winner = -1
+    total = 0
+    while total < max_rolls:
+        state = game.state
+        steps[STATE_CODES[state]] += 1
+        if state == State.ROLL:
+            rolls[game.turn] += 1
+            total += 1
+            server.roll()
+        elif state == State.MOVE:
+            directions = server.get_available_directions()
+            server.move(rng.choice(sorted(directions, key=lambda d: d.value)) if directions else None)
+        else:
+            player = game.active_player()
+            if game.active_square().kind in CATEGORY_KINDS:
+                server.get_question()
+            else:
+                # The center has no category of its own; the other players pick one
+                server.get_question(rng.choice(server.categories))
+            correct = rng.random() < correct_rate
+            if correct and player.location == CENTER and len(player.score) >= TO_WIN:
+                winner = game.turn
+                break
+            server.verify_question(correct)
+    return total, winner, tuple(rolls), tuple(steps)
+
+
+def run_chunk(task):
+    seed, chunk, games, players, correct_rate, max_rolls = task
+    server = TrivialComputeServer(QuestionRetriever(synthetic_bank()), seed=derive_seed(seed, chunk))
+    rng = random.Random(derive_seed(seed, chunk, 'players'))
+    names = [f"Player {i + 1}" for i in range(players)]
+    return [play_game(server, names, CATEGORIES, rng, correct_rate, max_rolls) for _ in range(games)]
+
+
+def quiet_worker():
+    # Game prints every step; workers have nobody to show it to
+    sys.stdout = open(os.devnull, 'w')
+
+
+def tasks(games, players, seed, correct_rate, max_rolls, chunk_size):
+    for chunk, start in enumerate(range(0, games, chunk_size)):
+        yield seed, chunk, min(chunk_size, games - start), players, correct_rate, max_rolls
+
+
+def simulate(games, players=2, workers=None, seed=0, correct_rate=0.5, max_rolls=MAX_ROLLS, chunk_size=CHUNK_SIZE):
+    # Per-game statistics for every game, in chunk order
+    start = time.perf_counter()
+    work = list(tasks(games, players, seed, correct_rate, max_rolls, chunk_size))
+    if workers == 1:
+        with contextlib.redirect_stdout(io.StringIO()):
+            chunks = [run_chunk(task) for task in work]
+    else:
+        with multiprocessing.Pool(workers, initializer=quiet_worker) as pool:
+            chunks = pool.map(run_chunk, work, chunksize=1)
+    results = [result for chunk in chunks for result in chunk]
+    return results, time.perf_counter() - start
+
+
+def summarize(results, players, seconds=None):
+    finished = [result for result in results if result[1] >= 0]
+    lengths = sorted(result[0] for result in finished)
+    wins = [0] * players
+    for result in finished:
+        wins[result[1]] += 1
+    steps = [sum(result[3][i] for result in results) for i in range(len(STATES))]
+    total_steps = sum(steps) or 1
+    report = {
+        'games': len(results),
+        'unfinished': len(results) - len(finished),
+        'mean_rolls': statistics.fmean(lengths) if lengths else 0.0,
+        'median_rolls': statistics.median(lengths) if lengths else 0,
+        'p90_rolls': lengths[int(len(lengths) * 0.9)] if lengths else 0,
+        'rolls_per_player': [statistics.fmean(result[2][i] for result in results) if results else 0.0
+                             for i in range(players)],
+        'state_share': {state.name: count / total_steps for state, count in zip(STATES, steps)},
+        'win_rate': [count / len(finished) if finished else 0.0 for count in wins],
+    }
+    # How much more often the first player wins than a fair share would give
+    report['first_player_advantage'] = report['win_rate'][0] - 1 / players if finished else 0.0
+    if seconds is not None:
+        report['seconds'] = seconds
+        report['games_per_second'] = len(results) / seconds if seconds else 0.0
+    return report
+
+
+def print_report(report):
+    print(f"{report['games']} games ({report['unfinished']} unfinished)")
+    print(f"Rolls per game: mean {report['mean_rolls']:.1f}, median {report['median_rolls']}, p90 {report['p90_rolls']}")
+    print("Rolls per player: " + ', '.join(f"{rolls:.1f}" for rolls in report['rolls_per_player']))
+    print("Steps by state: " + ', '.join(f"{name} {share:.1%}" for name, share in report['state_share'].items()))
+    print("Win rate by seat: " + ', '.join(f"{rate:.1%}" for rate in report['win_rate']))
+    print(f"First player advantage: {report['first_player_advantage']:+.2%}")
+    if 'games_per_second' in report:
+        print(f"{report['games_per_second']:.0f} games/s over {report['seconds']:.1f} s")
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description="Play many random games and report on balance")
+    parser.add_argument('--games', type=int, default=10_000)
+    parser.add_argument('--players', type=int, default=2)
+    parser.add_argument('--workers', type=int, default=None, help="worker processes (default: one per core)")
+    parser.add_argument('--seed', type=int, default=0)
+    parser.add_argument('--correct-rate', type=float, default=0.5)
+    parser.add_argument('--max-rolls', type=int, default=MAX_ROLLS)
+    args = parser.parse_args()
+    results, seconds = simulate(args.games, args.players, args.workers, args.seed, args.correct_rate, args.max_rolls)
+    print_report(summarize(results, args.players, seconds))
@@ -0,0 +1,168 @@
+import random
+import struct
+
+from server import Deck, Direction, Game, Kind, State
+
+# Compact binary snapshots of a Game, for checkpointing and for moving games
+# between processes. Only what the rules and the question draws need is
+# stored: player names, locations, directions and tokens, whose turn it is,
+# the state, the pending roll, both RNGs and where each deck is in its
+# shuffle. Decks are saved without their questions, which belong to the
+# retriever; a restored deck picks its list up again on its next draw, as
+# long as the category still has as many questions. The question being asked
+# and the retriever's difficulty statistics are not part of the game.
+#
+#   header   magic "TCG", version, state, turn, roll, player count, flags
+#   player   location, direction, token bitmask, name length, UTF-8 name
+#   rng      (flag 1) dice Mersenne Twister words, position, gauss_next
+#   rng      (flag 4) the same for the question RNG
+#   decks    count, then per deck: name length, UTF-8 category, size,
+#            remaining, upcoming position or -1, swap count, swap pairs
+
+MAGIC = b'TCG'
+VERSION = 2
+HAS_RNG = 1
+HAS_GAUSS = 2
+HAS_QUESTION_RNG = 4
+HAS_QUESTION_GAUSS = 8
+
+HEADER = struct.Struct('<3sBBBBBB')
+PLAYER = struct.Struct('<BBBB')
+MT_STATE = struct.Struct('<625I')
+GAUSS = struct.Struct('<d')
+DECK = struct.Struct('<IIiI')
+COUNT = struct.Struct('<B')
+MAX_PLAYERS = 255
+MAX_NAME = 255  # UTF-8 bytes
+MAX_DECKS = 255
+
+DIRECTIONS = tuple(Direction)
+STATES = tuple(State)
+DIRECTION_CODES = {direction: code for code, direction in enumerate(DIRECTIONS)}
+STATE_CODES = {state: code for code, state in enumerate(STATES)}
+CATEGORY_BITS = ((Kind.CATEGORY1, 1), (Kind.CATEGORY2, 2), (Kind.CATEGORY3, 4), (Kind.CATEGORY4, 8))
+SCORES = tuple(frozenset(kind for kind, bit in CATEGORY_BITS if mask & bit) for mask in range(16))
+
+
+class SnapshotError(ValueError):
+    pass
+
+
+def check_players(names):
+    # Everything a snapshot stores per game in one byte
+    if len(names) > MAX_PLAYERS:
+        raise SnapshotError(f"A snapshot holds at most {MAX_PLAYERS} players")
+    for name in names:
+        if len(name.encode('utf-8')) > MAX_NAME:
+            raise SnapshotError(f"Player name longer than {MAX_NAME} bytes: {name[:20]}...")
+
+
+def check_decks(decks):
+    if len(decks) > MAX_DECKS:
+        raise SnapshotError(f"A snapshot holds at most {MAX_DECKS} decks")
+    for cat in decks:
+        if len(str(cat).encode('utf-8')) > MAX_NAME:
+            raise SnapshotError(f"Category name longer than {MAX_NAME} bytes: {str(cat)[:20]}...")
+
+
+def encode_rng(rng, has_rng, has_gauss):
+    # (flags, parts) for a random.Random; anything else is left out
+    if not isinstance(rng, random.Random):
+        return 0, []
+    _, words, gauss = rng.getstate()
+    parts = [MT_STATE.pack(*words)]
+    if gauss is None:
+        return has_rng, parts
+    return has_rng | has_gauss, parts + [GAUSS.pack(gauss)]
+
+
+def decode_rng(data, offset, has_gauss):
+    # (random.Random, offset after it)
+    words = MT_STATE.unpack_from(data, offset)
+    offset += MT_STATE.size
+    gauss = None
+    if has_gauss:
+        gauss = GAUSS.unpack_from(data, offset)[0]
+        offset += GAUSS.size
+    # Created without seeding, since setstate replaces the whole state
+    rng = random.Random.__new__(random.Random)
+    rng.setstate((3, words, gauss))
+    return rng, offset
+
+
+def encode_game(game):
+    check_players([player.name for player in game.players])
+    check_decks(game.decks)
+    dice_flags, dice = encode_rng(getattr(game, 'rng', None), HAS_RNG, HAS_GAUSS)
+    question_flags, questions = encode_rng(getattr(game, 'question_rng', None), HAS_QUESTION_RNG, HAS_QUESTION_GAUSS)
+
+    parts = [HEADER.pack(MAGIC, VERSION, STATE_CODES[game.state], game.turn, game.roll, len(game.players),
+                         dice_flags | question_flags)]
+    for player in game.players:
+        name = player.name.encode('utf-8')
+        mask = 0
+        for kind, bit in CATEGORY_BITS:
+            if kind in player.score:
+                mask |= bit
+        parts.append(PLAYER.pack(player.location, DIRECTION_CODES[player.direction], mask, len(name)))
+        parts.append(name)
+    parts.extend(dice)
+    parts.extend(questions)
+    parts.append(COUNT.pack(len(game.decks)))
+    for cat, deck in game.decks.items():
+        name = str(cat).encode('utf-8')
+        parts.append(COUNT.pack(len(name)))
+        parts.append(name)
+        parts.append(DECK.pack(deck.size, deck.remaining, -1 if deck.upcoming is None else deck.upcoming, len(deck.swaps)))
+        parts.append(struct.pack(f'<{2 * len(deck.swaps)}I', *(n for pair in deck.swaps.items() for n in pair)))
+    return b''.join(parts)
+
+
+def decode_game(data):
+    try:
+        magic, version, state, turn, roll, count, flags = HEADER.unpack_from(data)
+        if magic != MAGIC:
+            raise SnapshotError("Not a game snapshot")
+        if version != VERSION:
+            raise SnapshotError(f"Unsupported snapshot version {version}")
+
+        offset = HEADER.size
+        players = []
+        for _ in range(count):
+            location, direction, mask, length = PLAYER.unpack_from(data, offset)
+            offset += PLAYER.size
+            players.append((bytes(data[offset:offset + length]).decode('utf-8'), location, DIRECTIONS[direction], SCORES[mask]))
+            offset += length
+
+        rng = question_rng = None
+        if flags & HAS_RNG:
+            rng, offset = decode_rng(data, offset, flags & HAS_GAUSS)
+        if flags & HAS_QUESTION_RNG:
+            question_rng, offset = decode_rng(data, offset, flags & HAS_QUESTION_GAUSS)
+
+        decks = {}
+        deck_count, = COUNT.unpack_from(data, offset)
+        offset += COUNT.size
+        for _ in range(deck_count):
+            length, = COUNT.unpack_from(data, offset)
+            offset += COUNT.size
+            cat = bytes(data[offset:offset + length]).decode('utf-8')
+            offset += length
+            size, remaining, upcoming, swap_count = DECK.unpack_from(data, offset)
+            offset += DECK.size
+            swaps = struct.unpack_from(f'<{2 * swap_count}I', data, offset)
+            offset += 8 * swap_count
+            decks[cat] = Deck.restore(size, remaining, zip(swaps[::2], swaps[1::2]), None if upcoming < 0 else upcoming)
+
+        game = Game.restore([name for name, _, _, _ in players], STATES[state], turn, roll, rng, question_rng, decks)
+        for player, (_, location, direction, score) in zip(game.players, players):
+            player.location = location
+            player.direction = direction
+            player.score = set(score)
+    except SnapshotError:
+        raise
+    except (struct.error, IndexError, ValueError) as e:
+        raise SnapshotError(f"Corrupt game snapshot: {e}") from e
+    if offset != len(data):
+        raise SnapshotError("Trailing bytes after game snapshot")
+    return game
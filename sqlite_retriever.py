@@ -0,0 +1,114 @@
+import os
+import sqlite3
+import threading
+
+from question_bank import path_lock, prepare_database
+from sampling import DifficultySampler
+from search_index import parse_query
+from server import QUESTION_FILE, Question, QuestionRetriever
+
+# QuestionRetriever backend that keeps the bank in an indexed SQLite copy of
+# the spreadsheet instead of in memory. question_bank maps each selected
+# category to a SQLiteCategory, which random.choice can draw from directly;
+# a Question is only built for the row that is actually drawn.
+
+class SQLiteCategory:
+    def __init__(self, retriever, category):
+        self.retriever = retriever
+        self.category = category
+        self.size = retriever.count(category)
+
+    def __len__(self):
+        return self.size
+
+    def __getitem__(self, position):
+        if not 0 <= position < self.size:
+            raise IndexError(position)
+        question, answer, media = self.retriever.fetch(self.category, position)
+        return Question(self.category, question, answer, media)
+
+class SQLiteQuestionRetriever(QuestionRetriever):
+    def __init__(self, path=QUESTION_FILE, target_difficulty=None, database=None):
+        # database opens an existing question database (e.g. one filled by
+        # importer.py) directly instead of deriving one from the spreadsheet
+        self.sampler = DifficultySampler(target_difficulty)
+        self.path = None if database else path
+        self.database = database
+        self.categories = []
+        self.question_bank = {}
+        self.decks = {}
+        self.reload_lock = threading.Lock()
+        self.db_lock = threading.Lock()
+        self.watcher = None
+        self.stop_event = threading.Event()
+
+        self.signature = self.file_signature() if self.path else None
+        self.conn = self.connect()
+
+    def connect(self):
+        if self.database:
+            return sqlite3.connect(self.database, check_same_thread=False)
+        with path_lock(self.path):
+            db_path, built_path = prepare_database(self.path)
+            if built_path:
+                os.replace(built_path, db_path)
+        return sqlite3.connect(db_path, check_same_thread=False)
+
+    def query(self, sql, params=()):
+        with self.db_lock:
+            return self.conn.execute(sql, params).fetchall()
+
+    def count(self, category):
+        return self.query("SELECT COUNT(*) FROM questions WHERE category = ?", (category,))[0][0]
+
+    def fetch(self, category, position):
+        return self.query("SELECT question, answer, media FROM questions WHERE category = ? AND position = ?", (category, position))[0]
+
+    def search(self, text, prefix=False, limit=None):
+        # Same query syntax as SearchIndex, answered by the FTS5 table built with the database
+        terms = parse_query(text, prefix)
+        if not terms:
+            return []
+        match = ' '.join(f'"{term}"*' if is_prefix else f'"{term}"' for term, is_prefix in terms)
+        sql = ("SELECT q.category, q.question, q.answer, q.media FROM questions_search "
+               "JOIN questions q ON q.id = questions_search.rowid "
+               "WHERE questions_search MATCH ? ORDER BY q.id")
+        if limit is not None:
+            sql += f" LIMIT {int(limit)}"
+        return [Question(*row) for row in self.query(sql, (match,))]
+
+    def add_rows(self, rows):
+        raise NotImplementedError("Import rows into a question database with importer.import_questions instead")
+
+    def get_categories_excel(self):
+        rows = self.query("SELECT category FROM questions GROUP BY category ORDER BY MIN(id)")
+        return [category for category, in rows]
+
+    def set_categories(self, categories):
+        self.categories = categories
+
+        self.decks = {}
+        self.question_bank = {}
+        for cat in self.categories:
+            self.question_bank[cat] = SQLiteCategory(self, cat)
+            print(f"Loaded {len(self.question_bank[cat])} questions for category: {cat}")
+
+    def reload(self):
+        if self.database:
+            # Nothing to rebuild; recount so rows imported since the last look can be drawn
+            self.question_bank = {cat: SQLiteCategory(self, cat) for cat in self.categories}
+            return
+        with self.reload_lock:
+            signature = self.file_signature()
+            with path_lock(self.path):
+                db_path, built_path = prepare_database(self.path)
+                # Only the swap itself blocks draws; building the new file does not
+                with self.db_lock:
+                    if built_path:
+                        self.conn.close()
+                        os.replace(built_path, db_path)
+                        self.conn = sqlite3.connect(db_path, check_same_thread=False)
+            self.question_bank = {cat: SQLiteCategory(self, cat) for cat in self.categories}
+            self.signature = signature
+
+        print(f"Reloaded question database {db_path}")
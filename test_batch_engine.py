@@ -0,0 +1,45 @@
+from batch_engine import DIRECTIONS, KEEP_DIRECTION, STATES, BatchGames
+from server import Game, State
+import unittest
+import numpy as np
+
+class Test_BatchEngine(unittest.TestCase):
+    def test_matches_game(self):
+        num_games, num_players = 64, 3
+        batch = BatchGames(num_games, num_players, seed=7)
+        games = [Game(['Player 1', 'Player 2', 'Player 3']) for _ in range(num_games)]
+        rng = np.random.default_rng(11)
+
+        for _ in range(400):
+            if batch.in_state(State.ROLL).any():
+                rolls = batch.roll_dice(rng.integers(1, 7, size=num_games))
+                for i, game in enumerate(games):
+                    if game.state == State.ROLL and not batch.finished[i]:
+                        game.roll = int(rolls[i])
+                        game.state = State.MOVE
+
+            directions = batch.random_directions()
+            batch.move(directions)
+            for i, game in enumerate(games):
+                if game.state == State.MOVE and game.roll > 0:
+                    direction = None if directions[i] == KEEP_DIRECTION else DIRECTIONS[directions[i]]
+                    game.move(direction)
+
+            answers = rng.random(num_games) < 0.6
+            finished = batch.finished.copy()
+            batch.verify_question(answers)
+            for i, game in enumerate(games):
+                if game.state == State.QUESTION and not finished[i]:
+                    game.verify_question(bool(answers[i]))
+
+            for i, game in enumerate(games):
+                self.assertEqual(STATES[batch.state[i]], game.state)
+                self.assertEqual(batch.turn[i], game.turn)
+                self.assertEqual([DIRECTIONS[d] for d in batch.direction[i]], [p.direction for p in game.players])
+                self.assertEqual(list(batch.location[i]), [p.location for p in game.players])
+                self.assertEqual([bin(s).count('1') for s in batch.score[i]], [len(p.score) for p in game.players])
+
+        self.assertTrue(batch.finished.any())
+
+if __name__ == '__main__':
+    unittest.main()
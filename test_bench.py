@@ -0,0 +1,25 @@
+import bench
+import copy
+import unittest
+
+class Test_Bench(unittest.TestCase):
+    def test_run_and_compare(self):
+        report = bench.run(bank_sizes=(200,), player_counts=(2, 3), number=50,
+                           names=['roll', 'move', 'get_question', 'verify_question', 'games', 'load_rows'])
+        self.assertEqual(set(report['results']), {
+            'roll[bank=200,players=2]', 'roll[bank=200,players=3]',
+            'move[bank=200,players=2]', 'move[bank=200,players=3]',
+            'get_question[bank=200,players=2]', 'get_question[bank=200,players=3]',
+            'verify_question[bank=200,players=2]', 'verify_question[bank=200,players=3]',
+            'games[bank=200,players=2]', 'games[bank=200,players=3]', 'load_rows[bank=200]'})
+        self.assertGreater(report['results']['games[bank=200,players=2]']['games_per_second'], 0)
+
+        slower = copy.deepcopy(report)
+        slower['results']['roll[bank=200,players=2]']['median_us'] *= 2
+        rows, regressions = bench.compare(report, slower)
+        self.assertEqual(len(rows), 11)
+        self.assertEqual(regressions, ['roll[bank=200,players=2]'])
+        self.assertEqual(bench.compare(report, report)[1], [])
+
+if __name__ == '__main__':
+    unittest.main()
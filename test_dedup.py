@@ -0,0 +1,45 @@
+from dedup import collapse, find_duplicates
+from server import QuestionRetriever
+import random
+import time
+import unittest
+
+class Test_Dedup(unittest.TestCase):
+    def setUp(self):
+        self.rows = [
+            ('How many hearts does an octopus have?', 3, 'Science'),
+            ('What is the capital of France?', 'Paris', 'History'),
+            ('How many hearts does an octopus have', 3, 'Science'),
+            ('How many hearts does an octopus have?', 3, 'Art'),
+            ('What is the capital city of France?', 'Paris', 'History'),
+            ('What is 10 x 8?', 80, 'Math'),
+            ('how many HEARTS does an octopus have?!', 'Three', 'Science'),
+        ]
+
+    def test_clusters(self):
+        clusters = find_duplicates(self.rows)
+        # Near duplicates are only grouped within a category
+        self.assertEqual(clusters[0], [0, 2, 6])
+        self.assertEqual(collapse(self.rows, clusters)[:3], [self.rows[0], self.rows[1], self.rows[3]])
+        self.assertEqual(find_duplicates(self.rows, threshold=1.01), [])
+
+    def test_retriever_collapse(self):
+        retriever = QuestionRetriever(self.rows, dedup='collapse')
+        self.assertEqual(len(retriever.bank['Science']), 1)
+        self.assertEqual(len(retriever.bank['Art']), 1)
+        self.assertEqual(QuestionRetriever(self.rows, dedup='report').duplicate_clusters[0], [0, 2, 6])
+        self.assertEqual(len(QuestionRetriever(self.rows, dedup='report').bank['Science']), 3)
+
+    def test_large_bank(self):
+        rng = random.Random(3)
+        words = [f'word{i}' for i in range(2000)]
+        rows = [(' '.join(rng.choice(words) for _ in range(10)), 'Answer', 'Science') for _ in range(20_000)]
+        rows += [(question + '?', answer, category) for question, answer, category in rows[:100]]
+
+        start = time.perf_counter()
+        clusters = find_duplicates(rows)
+        print(f"find_duplicates over {len(rows)} rows took {time.perf_counter() - start:.2f} s")
+        self.assertEqual(len(clusters), 100)
+
+if __name__ == '__main__':
+    unittest.main()
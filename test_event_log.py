@@ -0,0 +1,123 @@
+from event_log import GameLog, events, replay
+from server import QuestionRetriever, State, TrivialComputeServer
+from sessions import SessionManager
+from snapshot import SnapshotError, encode_game
+import os
+import random
+import shutil
+import tempfile
+import time
+import unittest
+
+CATEGORIES = ['Math', 'Science', 'English', 'History']
+
+def make_retriever():
+    return QuestionRetriever(rows=[(f'{cat} question?', cat, cat) for cat in CATEGORIES])
+
+def step(server, rng):
+    game = server.game
+    if game.state == State.ROLL:
+        server.roll()
+    elif game.state == State.MOVE:
+        directions = server.get_available_directions()
+        server.move(rng.choice(sorted(directions, key=lambda d: d.value)) if directions else None)
+    else:
+        server.verify_question(rng.random() < 0.5)
+
+class Test_EventLog(unittest.TestCase):
+    def setUp(self):
+        self.dir = tempfile.mkdtemp()
+        self.path = os.path.join(self.dir, 'game.log')
+
+    def tearDown(self):
+        shutil.rmtree(self.dir)
+
+    def play(self, steps, snapshot_every=5):
+        server = TrivialComputeServer(make_retriever())
+        server.event_log = GameLog(self.path, snapshot_every)
+        server.start_game(['Alice', 'Bob', 'Carol'], CATEGORIES)
+        rng = random.Random(3)
+        history = [encode_game(server.game)]
+        for _ in range(steps):
+            step(server, rng)
+            history.append(encode_game(server.game))
+        return server, history
+
+    def test_replay_any_point(self):
+        server, history = self.play(200)
+        server.event_log.close()
+        game, meta, count = replay(self.path)
+        self.assertEqual(meta, {'categories': CATEGORIES})
+        self.assertEqual(count, 200)
+        self.assertEqual(encode_game(game), history[-1])
+        for upto in (0, 1, 4, 5, 6, 99, 137, 200):
+            game, _, count = replay(self.path, upto)
+            self.assertEqual(count, upto)
+            self.assertEqual(encode_game(game), history[upto])
+        self.assertEqual(len(list(events(self.path))), 200)
+        self.assertEqual(next(events(self.path))[0], 'roll')
+
+    def test_second_game_metadata(self):
+        server, history = self.play(12)
+        other = ['Art', 'Science', 'English', 'History']
+        server.question_retriever = QuestionRetriever(rows=[(f'{cat} question?', cat, cat) for cat in other])
+        server.start_game(['Dan'], other)
+        rng = random.Random(4)
+        for _ in range(3):
+            step(server, rng)
+        server.event_log.close()
+        self.assertEqual(replay(self.path)[1], {'categories': other})
+        self.assertEqual(replay(self.path, 11)[1], {'categories': CATEGORIES})
+
+        # Reopened, the log keeps pointing later snapshots at the second game's metadata
+        log = GameLog(self.path, 1)
+        server.event_log = log
+        step(server, rng)
+        log.close()
+        game, meta, count = replay(self.path)
+        self.assertEqual((meta, count), ({'categories': other}, 16))
+        self.assertEqual([player.name for player in game.players], ['Dan'])
+
+    def test_torn_tail_is_cut(self):
+        server, history = self.play(12)
+        server.event_log.close()
+        with open(self.path, 'ab') as f:
+            f.write(b'S\x09\x00')
+        log = GameLog(self.path, 5)
+        self.assertEqual(log.events, 12)
+        self.assertEqual(os.path.getsize(self.path), log.offset)
+        log.close()
+        self.assertEqual(encode_game(replay(self.path)[0]), history[-1])
+
+    def test_replay_is_fast(self):
+        server, history = self.play(2000, snapshot_every=64)
+        server.event_log.close()
+        start = time.perf_counter()
+        for upto in range(0, 2000, 100):
+            replay(self.path, upto)
+        self.assertLess((time.perf_counter() - start) / 20, 0.01)
+
+    def test_session_recovery(self):
+        manager = SessionManager(make_retriever, idle_timeout=0, log_directory=self.dir)
+        game_id = manager.start_game(['Alice', 'Bob'], CATEGORIES)
+        rng = random.Random(1)
+        for _ in range(30):
+            step(manager.session(game_id).server, rng)
+        before = encode_game(manager.game(game_id))
+        self.assertEqual(manager.evict_idle(), [game_id])
+
+        manager.recover_game(game_id)
+        self.assertEqual(encode_game(manager.game(game_id)), before)
+        self.assertEqual(manager.session(game_id).server.categories, CATEGORIES)
+        step(manager.session(game_id).server, rng)
+        manager.end_game(game_id)
+        self.assertEqual(replay(manager.log_path(game_id))[2], 31)
+
+        # A name the snapshot cannot hold is turned away before the game exists
+        with self.assertRaises(SnapshotError):
+            manager.start_game(['Alice', 'x' * 256], CATEGORIES)
+        self.assertEqual(len(manager), 0)
+        self.assertEqual(sorted(os.listdir(self.dir)), [f"{game_id}.log", f"{game_id}.log.idx"])
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,90 @@
+from importer import feed_retriever, import_questions
+from server import QuestionRetriever
+from sqlite_retriever import SQLiteQuestionRetriever
+import csv
+import json
+import os
+import shutil
+import tempfile
+import tracemalloc
+import unittest
+
+class Interrupted(Exception):
+    pass
+
+class Test_Importer(unittest.TestCase):
+    def setUp(self):
+        self.dir = tempfile.mkdtemp()
+        self.database = os.path.join(self.dir, 'bank.sqlite')
+
+    def tearDown(self):
+        shutil.rmtree(self.dir)
+
+    def write_csv(self, rows, name='pack.csv'):
+        path = os.path.join(self.dir, name)
+        with open(path, 'w', newline='', encoding='utf-8') as f:
+            writer = csv.writer(f)
+            writer.writerow(['Category', 'Question', 'Answer'])
+            writer.writerows(rows)
+        return path
+
+    def test_csv_resume(self):
+        rows = [['Math', f'What is {i} + {i}?\nShow your work.', str(2 * i)] for i in range(95)]
+        rows[10] = ['Math', '', 'missing question']
+        rows[20] = ['', 'No category?', 'x']
+        path = self.write_csv(rows)
+
+        calls = []
+        def interrupt(done, total, imported, rejected):
+            calls.append(imported)
+            if len(calls) == 3:
+                raise Interrupted()
+
+        with self.assertRaises(Interrupted):
+            import_questions(path, self.database, chunk_size=10, progress=interrupt)
+        self.assertEqual(calls, [10, 20, 30])
+
+        imported, rejected = import_questions(path, self.database, chunk_size=10, progress=lambda *args: None)
+        self.assertEqual((imported, rejected), (93, 2))
+        # Running it again is a no-op
+        self.assertEqual(import_questions(path, self.database, progress=lambda *args: None), (93, 2))
+
+        retriever = SQLiteQuestionRetriever(database=self.database)
+        retriever.set_categories(['Math'])
+        questions = [retriever.question_bank['Math'][i] for i in range(93)]
+        self.assertEqual(len({q.question for q in questions}), 93)
+        self.assertEqual(questions[0].question, 'What is 0 + 0?\nShow your work.')
+        self.assertEqual(len(retriever.search('what 93')), 1)
+        with self.assertRaises(NotImplementedError):
+            retriever.add_rows([('What is 1 + 1?', '2', 'Math')])
+
+    def test_jsonl(self):
+        path = os.path.join(self.dir, 'pack.jsonl')
+        with open(path, 'w', encoding='utf-8') as f:
+            f.write(json.dumps({'question': 'Who wrote Hamlet?', 'answer': 'Shakespeare', 'category': 'English'}) + '\n')
+            f.write('not json\n')
+            f.write(json.dumps({'Question': 'Café?', 'Answer': 3, 'Category': 'Art', 'Media': 'cafe.png'}) + '\n')
+
+        self.assertEqual(import_questions(path, self.database, progress=lambda *args: None), (2, 1))
+        retriever = SQLiteQuestionRetriever(database=self.database)
+        self.assertEqual(retriever.get_categories_excel(), ['English', 'Art'])
+        retriever.set_categories(['Art'])
+        self.assertEqual(retriever.question_bank['Art'][0].media_ref, 'cafe.png')
+
+        memory = QuestionRetriever([])
+        memory.set_categories(['English'])
+        self.assertEqual(feed_retriever(memory, path, progress=lambda *args: None), (2, 1))
+        self.assertEqual(memory.question_bank['English'][0].answer, 'Shakespeare')
+
+    def test_memory_is_bounded(self):
+        path = self.write_csv([['Science', f'Question number {i} ' + 'x' * 100, f'Answer {i}'] for i in range(50_000)])
+        tracemalloc.start()
+        try:
+            import_questions(path, self.database, chunk_size=1000, progress=lambda *args: None)
+            peak = tracemalloc.get_traced_memory()[1]
+        finally:
+            tracemalloc.stop()
+        self.assertLess(peak, os.path.getsize(path) / 4)
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,72 @@
+from media import MediaCache
+from server import Question, QuestionRetriever
+import server
+import mmap
+import os
+import shutil
+import tempfile
+import time
+import unittest
+from unittest import mock
+
+class Test_Media(unittest.TestCase):
+    def setUp(self):
+        self.dir = tempfile.mkdtemp()
+        self.paths = []
+        for i in range(4):
+            path = os.path.join(self.dir, f'{i}.png')
+            with open(path, 'wb') as f:
+                f.write(bytes([i]) * 100)
+            self.paths.append(path)
+
+    def tearDown(self):
+        shutil.rmtree(self.dir)
+
+    def test_lru_eviction(self):
+        cache = MediaCache(max_bytes=250)
+        self.assertEqual(cache.get(self.paths[0])[:], bytes([0]) * 100)
+        cache.get(self.paths[1])
+        cache.get(self.paths[0])
+        cache.get(self.paths[2])
+
+        # 1 was the least recently used entry
+        self.assertEqual(list(cache.entries), [self.paths[0], self.paths[2]])
+        self.assertEqual(cache.size, 200)
+
+    def test_only_large_files_are_mapped(self):
+        cache = MediaCache(mmap_bytes=100)
+        big = os.path.join(self.dir, 'big.png')
+        with open(big, 'wb') as f:
+            f.write(b'x' * 100)
+        with open(self.paths[0], 'wb') as f:
+            f.write(b'y' * 99)
+        # Small files hold no file descriptor once cached
+        self.assertIsInstance(cache.get(self.paths[0]), bytes)
+        self.assertIsInstance(cache.get(big), mmap.mmap)
+        self.assertEqual(cache.get(big)[:], b'x' * 100)
+
+    def test_question_media_is_lazy(self):
+        cache = MediaCache()
+        with mock.patch.object(server, 'MEDIA_CACHE', cache):
+            question = Question('Art', 'What is this?', 'A square', self.paths[3])
+            self.assertEqual(cache.size, 0)
+            self.assertEqual(question.media[:], bytes([3]) * 100)
+            self.assertIsNone(Question('Art', 'What is 1 + 1?', 2).media)
+
+    def test_draw_prefetches_next_question(self):
+        cache = MediaCache()
+        rows = [(f'Question {i}', 'Answer', 'Art', path) for i, path in enumerate(self.paths)]
+        with mock.patch.object(server, 'MEDIA_CACHE', cache):
+            retriever = QuestionRetriever(rows)
+            retriever.set_categories(['Art'])
+            decks = {}
+            retriever.draw('Art', decks)
+            deadline = time.time() + 5
+            while not cache.entries and time.time() < deadline:
+                time.sleep(0.01)
+            self.assertEqual(list(cache.entries), [decks['Art'].peek().media_ref])
+            upcoming = decks['Art'].peek()
+            self.assertIs(retriever.draw('Art', decks), upcoming)
+
+if __name__ == '__main__':
+    unittest.main()
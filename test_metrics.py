@@ -0,0 +1,102 @@
+from load_generator import http_request
+from metrics import BANK_LOADS, METRICS, SERVER_CALLS, SERVER_REJECTED, Histogram, Metrics
+from server import QuestionRetriever, State, TrivialComputeServer
+from sessions import SessionManager
+from web_server import GameService
+import asyncio
+import os
+import subprocess
+import sys
+import tempfile
+import unittest
+
+CATEGORIES = ['Math', 'Science', 'English', 'History']
+
+def make_retriever():
+    return QuestionRetriever(rows=[(f'{cat} question?', cat, cat) for cat in CATEGORIES])
+
+class Test_Metrics(unittest.TestCase):
+    def setUp(self):
+        self.metrics = Metrics()
+
+    def tearDown(self):
+        self.metrics.disable()
+        METRICS.disable()
+
+    def test_disabled_leaves_methods_alone(self):
+        roll = TrivialComputeServer.__dict__['roll']
+        init = QuestionRetriever.__dict__['__init__']
+        self.metrics.enable()
+        self.assertIsNot(TrivialComputeServer.__dict__['roll'], roll)
+        # Backends sessions imports lazily are covered too, even in a fresh process
+        script = ("from metrics import METRICS; METRICS.enable(); "
+                  "from shards import ShardedQuestionRetriever as cls; "
+                  "print(hasattr(cls.__dict__['__init__'], '__wrapped__'), hasattr(cls.__dict__['set_categories'], '__wrapped__'))")
+        output = subprocess.run([sys.executable, '-c', script], capture_output=True, text=True,
+                                cwd=os.path.dirname(os.path.abspath(__file__))).stdout
+        self.assertEqual(output.split(), ['True', 'True'])
+        self.assertTrue(self.metrics.enabled)
+        self.metrics.disable()
+        self.assertIs(TrivialComputeServer.__dict__['roll'], roll)
+        self.assertIs(QuestionRetriever.__dict__['__init__'], init)
+        self.assertFalse(self.metrics.enabled)
+
+    def test_records_calls(self):
+        self.metrics.enable()
+        server = TrivialComputeServer(make_retriever())
+        server.start_game(['Alice', 'Bob'], CATEGORIES)
+        server.roll()
+        self.assertEqual(server.roll(), -1)
+        with self.assertRaises(ValueError):
+            server.get_question('Art')
+
+        self.assertEqual(self.metrics.histogram(SERVER_CALLS, method='roll').count, 2)
+        self.assertEqual(self.metrics.histogram(SERVER_CALLS, method='start_game').count, 1)
+        self.assertEqual(self.metrics.histogram(BANK_LOADS, retriever='QuestionRetriever', step='__init__').count, 1)
+        self.assertEqual(self.metrics.counters[(SERVER_REJECTED, (('method', 'roll'),))], 1)
+
+        text = self.metrics.render()
+        self.assertIn('# TYPE trivial_compute_server_call_seconds histogram', text)
+        self.assertIn('trivial_compute_server_call_seconds_count{method="roll"} 2', text)
+        self.assertIn('trivial_compute_server_call_seconds_bucket{method="roll",le="+Inf"} 2', text)
+        self.assertIn('trivial_compute_server_errors_total{method="get_question"} 1', text)
+
+        self.metrics.clear()
+        self.assertEqual(self.metrics.histogram(SERVER_CALLS, method='roll').count, 0)
+        server.game.state = State.ROLL
+        server.roll()
+        self.assertEqual(self.metrics.histogram(SERVER_CALLS, method='roll').count, 1)
+
+    def test_histogram(self):
+        histogram = Histogram()
+        for seconds in (1e-6, 3e-6, 5e-5, 2.0):
+            histogram.observe(seconds)
+        self.assertEqual(histogram.quantile(0.5), 4e-6)
+        self.assertGreaterEqual(histogram.quantile(1.0), 2.0)
+        self.assertAlmostEqual(histogram.total, 2.000054)
+
+    def test_dump_and_endpoint(self):
+        METRICS.enable()
+        METRICS.clear()
+        path = os.path.join(tempfile.mkdtemp(), 'metrics.txt')
+        service = GameService(SessionManager(make_retriever))
+
+        async def scenario():
+            await service.start('127.0.0.1', 0)
+            try:
+                status, state = await http_request('127.0.0.1', service.port, 'POST', '/games',
+                                                   {'players': ['Alice'], 'categories': CATEGORIES})
+                await http_request('127.0.0.1', service.port, 'POST', f"/games/{state['game_id']}/roll")
+                return await http_request('127.0.0.1', service.port, 'GET', '/metrics')
+            finally:
+                await service.close()
+        status, text = asyncio.run(scenario())
+        self.assertEqual(status, 200)
+        self.assertIn('trivial_compute_server_call_seconds_count{method="roll"} 1', text)
+
+        METRICS.dump(path)
+        with open(path) as f:
+            self.assertEqual(f.read(), text)
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,113 @@
+import question_bank
+from question_bank import load_questions, write_spreadsheet
+from server import Kind, QuestionRetriever, TrivialComputeServer
+from sqlite_retriever import SQLiteQuestionRetriever
+import os
+import shutil
+import tempfile
+import unittest
+from unittest import mock
+import time
+
+class Test_QuestionBank(unittest.TestCase):
+    def setUp(self):
+        self.dir = tempfile.mkdtemp()
+        self.path = os.path.join(self.dir, 'question_creator_gui.xlsx')
+        shutil.copy('question_creator_gui.xlsx', self.path)
+
+    def tearDown(self):
+        shutil.rmtree(self.dir)
+
+    def test_cache_reused_until_file_changes(self):
+        rows = load_questions(self.path)
+        self.assertTrue(os.path.exists(self.path + question_bank.CACHE_SUFFIX))
+        self.assertEqual(rows[0][0], 'How many hearts does an octopus have?')
+
+        with mock.patch.object(question_bank, 'read_spreadsheet') as read_spreadsheet:
+            self.assertEqual(load_questions(self.path), rows)
+
+            # A newer mtime with identical contents is matched by hash
+            os.utime(self.path, ns=(0, os.stat(self.path).st_mtime_ns + 10**9))
+            self.assertEqual(load_questions(self.path), rows)
+            read_spreadsheet.assert_not_called()
+
+        write_spreadsheet(self.path, [['What is 1 + 1?', '2', 'Math']])
+        self.assertEqual(load_questions(self.path), [('What is 1 + 1?', '2', 'Math', None)])
+
+    def write_bank(self, rows):
+        write_spreadsheet(self.path, rows)
+        # Make sure the change is visible even on filesystems with coarse mtimes
+        stat = os.stat(self.path)
+        os.utime(self.path, ns=(stat.st_atime_ns, stat.st_mtime_ns + 10**9))
+
+    def test_reload_diff(self):
+        self.write_bank([
+            ['What is 1 + 1?', '2', 'Math'],
+            ['What is 2 + 2?', '4', 'Math'],
+            ['What is H2O?', 'Water', 'Science'],
+            ['Who wrote Hamlet?', 'Shakespeare', 'English'],
+        ])
+        retriever = QuestionRetriever(path=self.path)
+        retriever.set_categories(['Math', 'Science', 'English', 'History'])
+        math = retriever.question_bank['Math']
+        english = retriever.question_bank['English']
+
+        self.write_bank([
+            ['What is 1 + 1?', '2', 'Math'],
+            ['What is 2 + 2?', 'Four', 'Math'],
+            ['Who wrote Hamlet?', 'Shakespeare', 'English'],
+            ['When did WWII end?', '1945', 'History'],
+        ])
+        diff = retriever.reload()
+        self.assertEqual([q.answer for q in retriever.search('what is')], ['2', 'Four'])
+        self.assertEqual(retriever.search('water'), [])
+        self.assertEqual(len(retriever.search('wwii')), 1)
+
+        self.assertEqual(diff, {'added': 1, 'removed': 1, 'changed': 1})
+        self.assertIs(retriever.question_bank['Math'][0], math[0])
+        self.assertEqual(retriever.question_bank['Math'][1].answer, 'Four')
+        self.assertIs(retriever.question_bank['English'], english)
+        self.assertEqual(retriever.question_bank['Science'], [])
+        self.assertEqual(retriever.get_question(Kind.CATEGORY4).answer, '1945')
+        self.assertEqual(retriever.get_categories_excel(), ['Math', 'English', 'History'])
+
+    def test_watch_reloads(self):
+        self.write_bank([['What is 1 + 1?', '2', 'Math']])
+        retriever = QuestionRetriever(path=self.path)
+        retriever.set_categories(['Math'])
+        retriever.watch(interval=0.01)
+        try:
+            self.write_bank([['What is 1 + 1?', '2', 'Math'], ['What is 3 + 3?', '6', 'Math']])
+            deadline = time.time() + 5
+            while len(retriever.question_bank['Math']) < 2 and time.time() < deadline:
+                time.sleep(0.01)
+        finally:
+            retriever.stop_watching()
+        self.assertEqual(len(retriever.question_bank['Math']), 2)
+
+    def test_sqlite_retriever(self):
+        retriever = SQLiteQuestionRetriever(path=self.path)
+        self.assertTrue(os.path.exists(self.path + question_bank.DATABASE_SUFFIX))
+        self.assertEqual(retriever.get_categories_excel(), QuestionRetriever(path=self.path).get_categories_excel())
+
+        server = TrivialComputeServer(retriever)
+        server.start_game(['Player 1'], ['Science', 'English', 'Math', 'History'])
+        self.assertEqual(len(retriever.question_bank['Math']), 7)
+        self.assertEqual(retriever.get_question(Kind.CATEGORY1).category, 'Science')
+        self.assertEqual(server.get_question('History').category, 'History')
+        self.assertEqual({q.question for q in retriever.question_bank['Math']},
+                         {q.question for q in QuestionRetriever(path=self.path).bank['Math']})
+        for query in ['term', 'what is the term', 'phot*', 'how many', 'science magma']:
+            self.assertEqual(sorted(q.question for q in retriever.search(query)),
+                             sorted(q.question for q in QuestionRetriever(path=self.path).search(query)))
+
+        self.write_bank([['What is 1 + 1?', 2, 'Math']])
+        retriever.reload()
+        self.assertEqual(len(retriever.question_bank['Math']), 1)
+        self.assertEqual([q.question for q in retriever.search('1 + 1')], ['What is 1 + 1?'])
+        self.assertEqual(retriever.get_question(Kind.CATEGORY3).answer, 2)
+        self.assertEqual(len(retriever.question_bank['Science']), 0)
+        retriever.conn.close()
+
+if __name__ == '__main__':
+    unittest.main()
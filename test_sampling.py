@@ -0,0 +1,86 @@
+from question_bank import build_database
+from sampling import WeightTree
+from server import QuestionRetriever, TrivialComputeServer
+from sqlite_retriever import SQLiteQuestionRetriever
+import os
+import random
+import shutil
+import tempfile
+import unittest
+from unittest import mock
+
+class Test_Sampling(unittest.TestCase):
+    def test_weight_tree_distribution(self):
+        weights = [1, 2, 3, 4, 0, 1, 1]
+        tree = WeightTree(len(weights))
+        for i, weight in enumerate(weights):
+            if weight != 1:
+                tree.set(i, weight)
+        # Only nodes that differ from the default weight are stored
+        self.assertLess(len(tree.deltas), len(weights))
+        self.assertAlmostEqual(tree.total, sum(weights))
+        rng = random.Random(5)
+        counts = [0] * len(weights)
+        for _ in range(100_000):
+            counts[tree.draw(rng)] += 1
+        for count, weight in zip(counts, weights):
+            self.assertAlmostEqual(count / 100_000, weight / sum(weights), delta=0.01)
+
+    def test_draws_follow_target_difficulty(self):
+        rows = [(f'Question {i}', 'Answer', 'Math') for i in range(10)]
+        retriever = QuestionRetriever(rows, target_difficulty=0.9)
+        retriever.set_categories(['Math'])
+        questions = retriever.question_bank['Math']
+
+        # Question 0 is always missed, the others are always answered correctly
+        for _ in range(20):
+            for i, question in enumerate(questions):
+                retriever.record_answer(question, i != 0)
+
+        draws = [retriever.draw('Math', {}) for _ in range(2000)]
+        self.assertGreater(draws.count(questions[0]) / len(draws), 0.9)
+        self.assertAlmostEqual(retriever.sampler.difficulty(questions[0]), 21 / 22)
+
+    def test_seeded_draws_repeat(self):
+        rows = [(f'{cat} question {i}', 'Answer', cat) for cat in ['Math', 'Science', 'English', 'History'] for i in range(30)]
+
+        def play():
+            server = TrivialComputeServer(QuestionRetriever(rows, target_difficulty=0.7), seed=42)
+            server.start_game(['Alice'], ['Math', 'Science', 'English', 'History'])
+            asked = []
+            for i in range(40):
+                question = server.get_question('Math')
+                asked.append(question.question)
+                server.verify_question(i % 3 == 0)
+            return asked
+        self.assertEqual(play(), play())
+
+    def test_sqlite_rows_are_not_loaded(self):
+        directory = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, directory)
+        database = os.path.join(directory, 'bank.sqlite')
+        rows = [(f'{cat} question {i}', 'Answer', cat) for cat in ['Math', 'Science', 'English', 'History'] for i in range(2000)]
+        os.replace(build_database(database, rows, {}), database)
+        retriever = SQLiteQuestionRetriever(database=database, target_difficulty=0.7)
+        retriever.set_categories(['Math', 'Science', 'English', 'History'])
+
+        with mock.patch.object(retriever, 'fetch', wraps=retriever.fetch) as fetch:
+            for i in range(20):
+                retriever.record_answer(retriever.draw('Math', {}), i % 2 == 0)
+            # One row per draw
+            self.assertEqual(fetch.call_count, 20)
+            # A new game's lists only look up the questions already answered
+            retriever.set_categories(['Math', 'Science', 'English', 'History'])
+            retriever.draw('Math', {})
+            self.assertLessEqual(fetch.call_count, 20 + 20 + 1)
+
+    def test_server_records_answers(self):
+        server = TrivialComputeServer()
+        server.start_game(['Player 1'], server.get_categories_excel()[:4])
+        question = server.get_question('Math')
+        server.verify_question(False)
+        self.assertEqual(server.question_retriever.sampler.stats[(question.category, question.question)], (1, 0))
+        self.assertIsNone(server.game.question)
+
+if __name__ == '__main__':
+    unittest.main()
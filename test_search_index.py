@@ -0,0 +1,43 @@
+from search_index import SearchIndex, parse_query
+from server import Question, QuestionRetriever
+import unittest
+
+class Test_SearchIndex(unittest.TestCase):
+    def setUp(self):
+        self.questions = [
+            Question('Science', 'What process do plants use to make glucose?', 'Photosynthesis'),
+            Question('Science', 'What is the term for water turning into vapor?', 'Evaporation'),
+            Question('History', 'What year did World War II end?', 1945),
+            Question('Math', 'What is 10 x 8?', 80),
+        ]
+        self.index = SearchIndex(self.questions)
+
+    def test_keywords(self):
+        self.assertEqual(self.index.search('water'), [self.questions[1]])
+        self.assertEqual(self.index.search('WHAT science'), self.questions[:2])
+        self.assertEqual(self.index.search('1945'), [self.questions[2]])
+        self.assertEqual(self.index.search('water glucose'), [])
+        self.assertEqual(self.index.search(''), [])
+
+    def test_prefix(self):
+        self.assertEqual(parse_query('photo*'), [('photo', True)])
+        self.assertEqual(self.index.search('photo*'), [self.questions[0]])
+        self.assertEqual(self.index.search('what wa', prefix=True), [self.questions[1], self.questions[2]])
+        self.assertEqual(self.index.search('what', limit=1), [self.questions[0]])
+
+    def test_remove(self):
+        self.index.remove(self.questions[1])
+        self.assertEqual(self.index.search('water'), [])
+        self.assertNotIn('evaporation', self.index.vocabulary)
+        self.assertEqual(len(self.index), 3)
+
+    def test_retriever_search(self):
+        retriever = QuestionRetriever([
+            ('Who wrote Hamlet?', 'Shakespeare', 'English'),
+            ('Who painted the Mona Lisa?', 'Leonardo da Vinci', 'Art'),
+        ])
+        self.assertEqual([q.answer for q in retriever.search('who shake', prefix=True)], ['Shakespeare'])
+        self.assertEqual([q.category for q in retriever.search('art')], ['Art'])
+
+if __name__ == '__main__':
+    unittest.main()
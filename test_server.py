@@ -1,23 +1,27 @@
-from server import Direction, State, TrivialComputeServer
+from server import BOARD, Board, Deck, Direction, Game, Kind, OPPOSITE_DIRECTIONS, Player, QuestionRetriever, State, TrivialComputeServer
 import unittest
 import random
+import subprocess
+import sys
+import time
 
 class Test_Server(unittest.TestCase):
     def test_full_game(self):
         server = TrivialComputeServer()
-        game = server.start_game(['Player 1','Player 2'],['art','science'])
+        game = server.start_game(['Player 1','Player 2'], server.get_categories_excel()[:4])
 
         ended = False
         while not ended:
             while game.state == State.ROLL:
                 server.roll()
-                normal_options = [Direction.CLOCKWISE, Direction.COUNTER_CLOCKWISE]
-                dir = None
-                if server.game.active_player().direction in normal_options:
-                    dir = random.choice(normal_options)
-                    print(f"Chose to move {dir.name}")
+                while game.state == State.MOVE:
+                    dirs = server.get_available_directions()
+                    dir = None
+                    if dirs:
+                        dir = random.choice(list(dirs))
+                        print(f"Chose to move {dir.name}")
 
-                game = server.move(dir)
+                    game = server.move(dir)
                 if game.state == State.ROLL:
                     print("Rolling again!")
                     continue
@@ -30,5 +34,141 @@ class Test_Server(unittest.TestCase):
                 print(f"{game.active_player().name} answered {answer}")
                 game = server.verify_question(answer)
 
+    def test_move_player_transitions(self):
+        board = Board()
+        player = Player('Player 1')
+        player.location = 32
+        self.assertEqual(board.move_player(player), 1)
+
+        # A player with every category is forced down the spoke from a hub
+        player.location = 5
+        player.score = {Kind.CATEGORY1, Kind.CATEGORY2, Kind.CATEGORY3, Kind.CATEGORY4}
+        self.assertEqual(board.move_player(player), 35)
+        self.assertEqual(player.direction, Direction.DOWN)
+
+        # Moving off the center along a spoke stops on the hub
+        player.score = set()
+        player.location = 45
+        player.direction = Direction.RIGHT
+        self.assertEqual(board.move_player(player), 44)
+        self.assertEqual(board.move_player(player), 43)
+        self.assertEqual(board.move_player(player), "STOP")
+        self.assertEqual(player.location, 13)
+
+    def test_games_share_board(self):
+        first = Game(['Player 1'])
+        second = Game(['Player 1', 'Player 2'])
+        self.assertIs(first.board, second.board)
+        self.assertIsNot(first.players[0], second.players[0])
+        with self.assertRaises(TypeError):
+            first.board.index_map[99] = None
+
+    def test_destinations_match_moves(self):
+        server = TrivialComputeServer()
+        server.start_game(['Player 1'], server.get_categories_excel()[:4])
+        for (location, roll, complete), destinations in BOARD.destinations.items():
+            self.assertTrue(destinations)
+            for directions, square in destinations:
+                player = server.game.active_player()
+                player.location = location
+                player.score = {Kind.CATEGORY1, Kind.CATEGORY2, Kind.CATEGORY3, Kind.CATEGORY4} if complete else set()
+                if location in BOARD.center_directions:
+                    player.direction = BOARD.center_directions[location]
+                    if not complete:
+                        player.direction = OPPOSITE_DIRECTIONS[player.direction]
+                server.game.roll = roll
+                server.game.state = State.MOVE
+                for direction in directions:
+                    self.assertEqual(server.get_available_directions() is None, direction is None)
+                    server.move(direction)
+                self.assertEqual(server.game.roll, 0)
+                self.assertIs(server.game.active_square(), square)
+
+        server.game.roll = 3
+        server.game.state = State.MOVE
+        server.game.active_player().location = 99
+        self.assertEqual(len(server.get_destinations()), 4)
+
+    def test_start_game_large_bank(self):
+        rows = 200_000
+        categories = ['Science', 'English', 'Math', 'History', 'Art']
+        bank = [(f'Question {i}', f'Answer {i}', categories[i % len(categories)]) for i in range(rows)]
+        server = TrivialComputeServer(QuestionRetriever(bank))
+
+        start = time.perf_counter()
+        server.start_game(['Player 1', 'Player 2'], categories[:4])
+        elapsed = time.perf_counter() - start
+        print(f"start_game with {rows} questions took {elapsed * 1000:.2f} ms")
+
+        self.assertLess(elapsed, 0.05)
+        self.assertEqual(len(server.question_retriever.question_bank['Math']), rows // len(categories))
+        self.assertEqual(server.question_retriever.get_question(Kind.CATEGORY3).category, 'Math')
+
+    def test_deck_draws_each_question_once(self):
+        questions = list(range(50))
+        deck = Deck(questions)
+        first = [deck.draw() for _ in questions]
+        second = [deck.draw() for _ in questions]
+        self.assertEqual(sorted(first), questions)
+        self.assertEqual(sorted(second), questions)
+        self.assertEqual(questions, list(range(50)))
+
+    def test_questions_do_not_repeat(self):
+        server = TrivialComputeServer()
+        categories = server.get_categories_excel()[:4]
+        game = server.start_game(['Player 1'], categories)
+        math = server.question_retriever.question_bank['Math']
+        drawn = [server.get_question('Math') for _ in math]
+        self.assertEqual(len(set(map(id, drawn))), len(math))
+
+        # A new game gets its own deck over the same shared list
+        other = Game(['Player 2'])
+        self.assertIsNot(other.decks, game.decks)
+        game.active_player().location = 20
+        game.state = State.QUESTION
+        self.assertEqual(server.get_question().category, categories[0])
+        self.assertIs(game.decks[categories[0]].questions, server.question_retriever.question_bank[categories[0]])
+
+    def test_seeded_games_repeat(self):
+        bank = [(f'Question {i}', f'Answer {i}', cat) for cat in ['Science', 'English', 'Math', 'History'] for i in range(20)]
+
+        def play(seed, games=2, questions=True):
+            server = TrivialComputeServer(QuestionRetriever(bank), seed=seed)
+            history = []
+            for _ in range(games):
+                server.start_game(['Player 1', 'Player 2'], ['Science', 'English', 'Math', 'History'])
+                for _ in range(10):
+                    server.game.state = State.ROLL
+                    history.append(server.roll())
+                    if questions:
+                        history.append(server.get_question('Math').question)
+            return history
+
+        self.assertEqual(play(7), play(7))
+        self.assertNotEqual(play(7), play(8))
+        # Each game has its own streams, and question draws never move the dice
+        first, second = play(7)[::2], play(7, questions=False)
+        self.assertEqual(first, second)
+        self.assertNotEqual(second[:10], second[10:])
+
+    def test_import_time(self):
+        # Importing the server and loading the bank must not pull in pandas
+        script = (
+            "import sys, time\n"
+            "start = time.perf_counter()\n"
+            "import server\n"
+            "imported = time.perf_counter()\n"
+            "server.TrivialComputeServer()\n"
+            "print(imported - start, time.perf_counter() - imported, 'pandas' in sys.modules)\n"
+        )
+        TrivialComputeServer()  # make sure the parsed-bank cache exists
+        output = subprocess.run([sys.executable, '-c', script], capture_output=True, text=True, check=True).stdout
+        import_time, load_time, pandas_loaded = output.split()[-3:]
+        print(f"import server: {float(import_time) * 1000:.1f} ms, TrivialComputeServer(): {float(load_time) * 1000:.1f} ms")
+
+        self.assertEqual(pandas_loaded, 'False')
+        self.assertLess(float(import_time), 0.5)
+        self.assertLess(float(load_time), 0.5)
+
 if __name__ == '__main__':
     unittest.main()
@@ -0,0 +1,159 @@
+from question_bank import write_spreadsheet
+import shards
+from server import QuestionRetriever, State
+from sessions import SessionManager, UnknownGameError, index_size
+from shards import ShardCache, ShardedQuestionRetriever
+import os
+import shutil
+import tempfile
+import threading
+import time
+import unittest
+from unittest import mock
+
+class Test_Sessions(unittest.TestCase):
+    def setUp(self):
+        self.dir = tempfile.mkdtemp()
+        self.path = os.path.join(self.dir, 'question_creator_gui.xlsx')
+        rows = [[f'{cat} question {i}?', f'{cat} {i}', cat] for cat in ['Math', 'Science', 'English', 'History', 'Art'] for i in range(5)]
+        write_spreadsheet(self.path, rows)
+        self.cache = ShardCache(idle=0)
+        self.now = 0.0
+        self.manager = SessionManager(lambda: ShardedQuestionRetriever(self.path, cache=self.cache),
+                                      idle_timeout=60, clock=lambda: self.now)
+
+    def tearDown(self):
+        shutil.rmtree(self.dir)
+
+    def test_games_are_independent(self):
+        first = self.manager.start_game(['Alice', 'Bob'], ['Math', 'Science', 'English', 'History'])
+        second = self.manager.start_game(['Carol'], ['Art', 'Science', 'English', 'History'])
+        self.assertNotEqual(first, second)
+
+        roll = self.manager.roll(first)
+        self.assertGreater(roll, 0)
+        self.assertEqual(self.manager.game(first).state, State.MOVE)
+        self.assertEqual(self.manager.game(second).state, State.ROLL)
+        self.assertEqual(self.manager.roll(first), -1)
+
+        directions = self.manager.get_available_directions(first)
+        self.manager.move(first, min(directions, key=lambda d: d.value) if directions else None)
+        self.assertIn(self.manager.game(first).state, (State.MOVE, State.QUESTION, State.ROLL))
+        self.assertIsNotNone(self.manager.get_question(second, 'Art'))
+        self.assertEqual(self.manager.get_score(second, self.manager.game(second).players[0]), [])
+        self.assertEqual(self.manager.game(second).state, State.ROLL)
+        self.manager.verify_question(second, False)
+
+        with self.assertRaises(UnknownGameError):
+            self.manager.roll('missing')
+        with self.assertRaises(ValueError):
+            self.manager.start_game(['Dan'], ['Math', 'Science', 'English', 'History'], game_id=first)
+
+    def test_idle_games_evicted(self):
+        first = self.manager.start_game(['Alice'], ['Math', 'Science', 'English', 'History'])
+        self.now = 50
+        second = self.manager.start_game(['Bob'], ['Art', 'Science', 'English', 'History'])
+        self.assertEqual(len(self.cache.loaded), 5)
+
+        self.now = 70
+        self.manager.roll(second)
+        self.assertEqual(self.manager.evict_idle(), [first])
+        self.assertNotIn(first, self.manager)
+        # Shards only the evicted game used are released
+        self.assertEqual(len(self.cache.loaded), 4)
+
+        self.now = 200
+        self.assertEqual(self.manager.evict_idle(), [second])
+        self.assertEqual(len(self.manager), 0)
+        self.assertEqual(self.cache.loaded, {})
+
+    def test_call_waiting_on_an_ended_game(self):
+        game_id = self.manager.start_game(['Alice'], ['Math', 'Science', 'English', 'History'])
+        session = self.manager.session(game_id)
+        errors = []
+
+        def roll():
+            try:
+                self.manager.roll(game_id)
+            except UnknownGameError as e:
+                errors.append(e)
+
+        # The roll looks the game up, then waits for its lock while the game ends
+        session.lock.acquire()
+        roller = threading.Thread(target=roll)
+        roller.start()
+        time.sleep(0.05)
+        ender = threading.Thread(target=self.manager.end_game, args=(game_id,))
+        ender.start()
+        time.sleep(0.05)
+        session.lock.release()
+        roller.join()
+        ender.join()
+        self.assertEqual(len(errors), 1)
+        self.assertEqual(session.server.game.state, State.ROLL)
+
+    def test_memory_report(self):
+        game_id = self.manager.start_game(['Alice', 'Bob'], ['Math', 'Science', 'English', 'History'])
+        before = self.manager.memory_usage(game_id)
+        self.assertGreater(before, 0)
+        self.manager.get_question(game_id, 'Math')
+        self.assertGreater(self.manager.memory_usage(game_id), before)
+        self.assertEqual(list(self.manager.memory_report()), [game_id])
+
+        # A retriever of its own brings its own search index, which is counted
+        rows = [(f'{cat} question {i}?', f'{cat} {i}', cat) for cat in ['Math', 'Science', 'English', 'History'] for i in range(50)]
+        manager = SessionManager(lambda: QuestionRetriever(rows))
+        own = manager.start_game(['Alice', 'Bob'], ['Math', 'Science', 'English', 'History'])
+        index = manager.session(own).server.question_retriever.search_index
+        self.assertGreater(manager.memory_usage(own), index_size(index))
+
+    def test_games_share_manifest(self):
+        with mock.patch.object(shards, 'read_manifest', wraps=shards.read_manifest) as read:
+            for _ in range(5):
+                self.manager.start_game(['Alice'], ['Math', 'Science', 'English', 'History'])
+        self.assertEqual(read.call_count, 1)
+
+    def test_games_started_concurrently(self):
+        # The shards do not exist yet, so every thread races to build them
+        barrier = threading.Barrier(16)
+        ids, errors = [], []
+
+        def start():
+            barrier.wait()
+            try:
+                ids.append(self.manager.start_game(['Alice'], ['Math', 'Science', 'English', 'History']))
+            except Exception as e:
+                errors.append(e)
+
+        threads = [threading.Thread(target=start) for _ in range(16)]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+        self.assertEqual(errors, [])
+        self.assertEqual(len(set(ids)), 16)
+        self.assertFalse([name for name in os.listdir(self.dir) + os.listdir(self.path + '.shards') if name.endswith('.tmp')])
+
+    def test_concurrent_games(self):
+        ids = [self.manager.start_game(['Alice', 'Bob'], ['Math', 'Science', 'English', 'History']) for _ in range(20)]
+
+        def play(game_id):
+            for _ in range(50):
+                game = self.manager.game(game_id)
+                if game.state == State.ROLL:
+                    self.manager.roll(game_id)
+                elif game.state == State.MOVE:
+                    directions = self.manager.get_available_directions(game_id)
+                    self.manager.move(game_id, min(directions, key=lambda d: d.value) if directions else None)
+                else:
+                    self.manager.verify_question(game_id, False)
+
+        threads = [threading.Thread(target=play, args=(game_id,)) for game_id in ids]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+        self.assertEqual(len(self.manager.memory_report()), 20)
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,83 @@
+from question_bank import write_spreadsheet
+import shards
+from shards import ShardCache, ShardedQuestionRetriever
+from server import Kind, TrivialComputeServer
+import os
+import shutil
+import tempfile
+import unittest
+from unittest import mock
+
+class Test_Shards(unittest.TestCase):
+    def setUp(self):
+        self.dir = tempfile.mkdtemp()
+        self.path = os.path.join(self.dir, 'question_creator_gui.xlsx')
+        rows = [[f'{cat} question {i}?', f'{cat} {i}', cat] for cat in ['Math', 'Science', 'English', 'History', 'Art', 'Music'] for i in range(5)]
+        write_spreadsheet(self.path, rows)
+
+    def tearDown(self):
+        shutil.rmtree(self.dir)
+
+    def test_categories_come_from_manifest(self):
+        first = ShardedQuestionRetriever(self.path, cache=ShardCache())
+        self.assertEqual(first.get_categories_excel(), ['Math', 'Science', 'English', 'History', 'Art', 'Music'])
+        self.assertEqual(len(os.listdir(shards.shard_directory(self.path))), 7)
+
+        with mock.patch.object(shards, 'load_questions') as load, mock.patch.object(shards, 'file_digest') as digest:
+            second = ShardedQuestionRetriever(self.path, cache=ShardCache())
+            self.assertEqual(second.get_categories_excel(), first.get_categories_excel())
+            load.assert_not_called()
+            digest.assert_not_called()
+
+    def test_touched_spreadsheet_refreshes_manifest(self):
+        ShardedQuestionRetriever(self.path, cache=ShardCache())
+        stat = os.stat(self.path)
+        os.utime(self.path, ns=(stat.st_atime_ns, stat.st_mtime_ns + 10**9))
+        with mock.patch.object(shards, 'load_questions') as load:
+            ShardedQuestionRetriever(self.path, cache=ShardCache())
+            load.assert_not_called()
+        # Hashed once; after that the stat check is enough
+        with mock.patch.object(shards, 'file_digest') as digest:
+            ShardedQuestionRetriever(self.path, cache=ShardCache())
+            digest.assert_not_called()
+
+    def test_shards_shared_and_evicted(self):
+        cache = ShardCache(idle=1)
+        first = ShardedQuestionRetriever(self.path, cache=cache)
+        second = ShardedQuestionRetriever(self.path, cache=cache)
+        first.set_categories(['Math', 'Science', 'English', 'History'])
+        second.set_categories(['Math', 'Science', 'English', 'Art'])
+        self.assertEqual(len(cache.loaded), 5)
+        self.assertIs(first.question_bank['Math'], second.question_bank['Math'])
+        self.assertEqual(len(first.question_bank['History']), 5)
+
+        # Search indexes are built on first use, once per shard
+        self.assertEqual(cache.indexes, {})
+        self.assertEqual([q.answer for q in first.search('question 2')], ['Math 2', 'Science 2', 'English 2', 'History 2'])
+        self.assertEqual([q.answer for q in second.search('question 2', limit=2)], ['Math 2', 'Science 2'])
+        self.assertEqual(len(cache.indexes), 4)
+        self.assertIs(cache.search_index(first.held['Math']), cache.search_index(second.held['Math']))
+
+        # Only shards no retriever holds any more are dropped, keeping one idle
+        first.close()
+        self.assertEqual(len(cache.loaded), 5)
+        self.assertEqual(len(cache.unused), 1)
+        second.close()
+        self.assertEqual(len(cache.loaded), 1)
+        self.assertLessEqual(len(cache.indexes), 1)
+        self.assertEqual(cache.refs, {})
+
+    def test_game_draws_from_shards(self):
+        server = TrivialComputeServer(ShardedQuestionRetriever(self.path, cache=ShardCache()))
+        server.start_game(['Alice', 'Bob'], ['Math', 'Science', 'English', 'History'])
+        question = server.question_retriever.get_question(Kind.CATEGORY2)
+        self.assertEqual(question.category, 'Science')
+        self.assertEqual(server.search_questions('history question 3')[0].answer, 'History 3')
+
+        # The shard lists are shared with other games, so they are never extended
+        with self.assertRaises(NotImplementedError):
+            server.question_retriever.add_rows([('Extra?', 'Yes', 'Math')])
+        self.assertEqual(len(server.question_retriever.question_bank['Math']), 5)
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,31 @@
+from simulate import simulate, summarize
+import unittest
+
+class Test_Simulate(unittest.TestCase):
+    def test_report(self):
+        results, seconds = simulate(40, players=3, workers=1, seed=3, chunk_size=15)
+        self.assertEqual(len(results), 40)
+        report = summarize(results, 3, seconds)
+        self.assertEqual(report['games'], 40)
+        self.assertEqual(report['unfinished'], 0)
+        self.assertAlmostEqual(sum(report['win_rate']), 1.0)
+        self.assertAlmostEqual(sum(report['state_share'].values()), 1.0)
+        self.assertEqual(report['state_share']['VERIFY'], 0.0)
+        for length, winner, rolls, steps in results:
+            self.assertEqual(sum(rolls), length)
+            self.assertEqual(steps[0], length)
+            self.assertIn(winner, range(3))
+
+    def test_same_results_for_any_worker_count(self):
+        serial, _ = simulate(12, players=2, workers=1, seed=5, chunk_size=5)
+        parallel, _ = simulate(12, players=2, workers=2, seed=5, chunk_size=5)
+        self.assertEqual(serial, parallel)
+        self.assertNotEqual(serial, simulate(12, players=2, workers=1, seed=6, chunk_size=5)[0])
+
+    def test_round_cap(self):
+        results, _ = simulate(3, players=2, workers=1, correct_rate=0.0, max_rolls=50)
+        self.assertEqual(summarize(results, 2)['unfinished'], 3)
+        self.assertEqual([result[0] for result in results], [50, 50, 50])
+
+if __name__ == '__main__':
+    unittest.main()
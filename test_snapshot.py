@@ -0,0 +1,92 @@
+from server import Direction, Game, Kind, QuestionRetriever, State, TrivialComputeServer
+from snapshot import MT_STATE, SnapshotError, decode_game, encode_game
+import random
+import time
+import unittest
+
+class Test_Snapshot(unittest.TestCase):
+    def make_game(self):
+        game = Game(['Alice', 'Bøb', 'Carol'])
+        game.turn = 1
+        game.state = State.MOVE
+        game.roll = 4
+        game.players[0].location = 42
+        game.players[0].direction = Direction.UP
+        game.players[0].score = {Kind.CATEGORY1, Kind.CATEGORY4}
+        game.players[1].location = 7
+        game.players[1].direction = Direction.COUNTER_CLOCKWISE
+        return game
+
+    def assertSameGame(self, first, second):
+        self.assertEqual((first.state, first.turn, first.roll), (second.state, second.turn, second.roll))
+        self.assertEqual([(p.name, p.location, p.direction, p.score) for p in first.players],
+                         [(p.name, p.location, p.direction, p.score) for p in second.players])
+
+    def test_round_trip(self):
+        game = self.make_game()
+        data = encode_game(game)
+        # Most of the snapshot is the two RNGs' Mersenne Twister states
+        self.assertLess(len(data), 40 + 2 * MT_STATE.size)
+        restored = decode_game(data)
+        self.assertSameGame(restored, game)
+        self.assertIs(restored.board, game.board)
+        self.assertEqual(encode_game(restored), data)
+
+    def test_rng_state(self):
+        game = self.make_game()
+        game.rng = random.Random(5)
+        game.rng.gauss(0, 1)
+        restored = decode_game(encode_game(game))
+        self.assertEqual([restored.rng.random() for _ in range(5)], [game.rng.random() for _ in range(5)])
+        self.assertEqual(restored.rng.gauss(0, 1), game.rng.gauss(0, 1))
+
+    def test_restored_game_draws_the_same_questions(self):
+        rows = [(f'Math question {i}', 'Answer', 'Math') for i in range(20)]
+        server = TrivialComputeServer(QuestionRetriever(rows), seed=7)
+        server.start_game(['Alice'], ['Math'])
+        asked = [server.get_question('Math').question for _ in range(8)]
+        data = encode_game(server.game)
+
+        # A new server with its own copy of the bank, as after a restart
+        restored = TrivialComputeServer(QuestionRetriever(rows))
+        restored.question_retriever.set_categories(['Math'])
+        restored.game = decode_game(data)
+        upcoming = [restored.get_question('Math').question for _ in range(12)]
+        self.assertEqual(upcoming, [server.get_question('Math').question for _ in range(12)])
+        # The rest of the shuffle: nothing asked before the snapshot comes up again
+        self.assertEqual(sorted(asked + upcoming), sorted(question for question, _, _ in rows))
+
+    def test_rejects_bad_data(self):
+        data = encode_game(self.make_game())
+        with self.assertRaises(SnapshotError):
+            decode_game(b'XYZ' + data[3:])
+        with self.assertRaises(SnapshotError):
+            decode_game(data[:3] + bytes([99]) + data[4:])
+        with self.assertRaises(SnapshotError):
+            decode_game(data[:-2])
+        with self.assertRaises(SnapshotError):
+            decode_game(data + b'\x00')
+
+    def test_limits(self):
+        game = self.make_game()
+        game.players[2].name = 'é' * 128
+        with self.assertRaises(SnapshotError):
+            encode_game(game)
+        game.players = game.players[:2] * 128
+        with self.assertRaises(SnapshotError):
+            encode_game(game)
+
+    def test_speed(self):
+        game = self.make_game()
+        # Best of a few rounds, so a busy machine does not fail the test
+        rounds = []
+        for _ in range(5):
+            start = time.perf_counter()
+            for _ in range(2_000):
+                decode_game(encode_game(game))
+            rounds.append((time.perf_counter() - start) / 2_000)
+        # Most of it is copying the two Mersenne Twister states in and out
+        self.assertLess(min(rounds), 200e-6)
+
+if __name__ == '__main__':
+    unittest.main()
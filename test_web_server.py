@@ -0,0 +1,201 @@
+from question_bank import write_spreadsheet
+from load_generator import GameConnection, generate_load, http_request
+from sessions import SessionManager
+from shards import ShardCache, ShardedQuestionRetriever
+from server import Direction, State
+from web_server import GameService
+import asyncio
+import os
+import shutil
+import tempfile
+import threading
+import time
+import unittest
+from unittest import mock
+
+class Test_WebServer(unittest.TestCase):
+    def setUp(self):
+        self.dir = tempfile.mkdtemp()
+        self.path = os.path.join(self.dir, 'question_creator_gui.xlsx')
+        rows = [[f'{cat} question {i}?', f'{cat} {i}', cat] for cat in ['Math', 'Science', 'English', 'History'] for i in range(5)]
+        write_spreadsheet(self.path, rows)
+        cache = ShardCache()
+        self.service = GameService(SessionManager(lambda: ShardedQuestionRetriever(self.path, cache=cache)))
+
+    def tearDown(self):
+        shutil.rmtree(self.dir)
+
+    def run_service(self, scenario):
+        async def main():
+            await self.service.start('127.0.0.1', 0)
+            try:
+                return await scenario(self.service.port)
+            finally:
+                await self.service.close()
+        return asyncio.run(main())
+
+    def test_http_and_push(self):
+        async def scenario(port):
+            status, body = await http_request('127.0.0.1', port, 'GET', '/categories')
+            self.assertEqual(body['categories'], ['Math', 'Science', 'English', 'History'])
+
+            status, state = await http_request('127.0.0.1', port, 'POST', '/games',
+                                               {'players': ['Alice', 'Bob'], 'categories': body['categories']})
+            self.assertEqual(status, 201)
+            self.assertEqual(state['state'], 'ROLL')
+            game_id = state['game_id']
+
+            watcher = await GameConnection.open('127.0.0.1', port, game_id)
+            self.assertEqual((await watcher.receive())['state'], 'ROLL')
+
+            status, body = await http_request('127.0.0.1', port, 'POST', f'/games/{game_id}/roll')
+            self.assertEqual(status, 200)
+            self.assertIn(body['roll'], range(1, 7))
+            # The roll made over HTTP is pushed to the WebSocket without asking
+            pushed = await watcher.receive()
+            self.assertEqual((pushed['type'], pushed['state'], pushed['roll']), ('state', 'MOVE', body['roll']))
+
+            status, body = await http_request('127.0.0.1', port, 'POST', f'/games/{game_id}/roll')
+            self.assertEqual(status, 409)
+            reply = await watcher.send('verify', correct=True)
+            self.assertFalse(reply['ok'])
+            self.assertEqual(reply['status'], 409)
+            reply = await watcher.send('directions')
+            self.assertTrue(reply['ok'])
+            await watcher.close()
+
+            status, body = await http_request('127.0.0.1', port, 'GET', '/games/999')
+            self.assertEqual(status, 404)
+            status, body = await http_request('127.0.0.1', port, 'POST', '/games',
+                                              {'players': ['x' * 300], 'categories': ['Math', 'Science', 'English', 'History']})
+            self.assertEqual(status, 400)
+        self.run_service(scenario)
+
+    def test_batch_stops_at_first_illegal_action(self):
+        async def scenario(port):
+            status, state = await http_request('127.0.0.1', port, 'POST', '/games',
+                                               {'players': ['Alice'], 'categories': ['Math', 'Science', 'English', 'History']})
+            game_id = state['game_id']
+            watcher = await GameConnection.open('127.0.0.1', port, game_id)
+            await watcher.receive()
+
+            status, body = await http_request('127.0.0.1', port, 'POST', f'/games/{game_id}/batch', {'actions': [
+                {'action': 'roll'}, {'action': 'directions'}, {'action': 'roll'}, {'action': 'directions'}]})
+            self.assertEqual(status, 200)
+            self.assertFalse(body['ok'])
+            self.assertEqual([result['action'] for result in body['results']], ['roll', 'directions'])
+            self.assertEqual(body['error']['index'], 2)
+            self.assertEqual(body['error']['status'], 409)
+            self.assertEqual(body['state']['state'], 'MOVE')
+            # One push for the whole batch
+            self.assertEqual((await watcher.receive())['roll'], body['results'][0]['roll'])
+
+            directions = body['results'][1]['directions']
+            reply = await watcher.send('batch', actions=[{'action': 'move', 'direction': 'CLOCKWISE'}])
+            self.assertEqual(reply['error']['status'], 400)
+            reply = await watcher.send('batch', actions=[{'action': 'move', 'direction': directions[0]}])
+            self.assertTrue(reply['ok'])
+            self.assertEqual(reply['results'], [{'action': 'move'}])
+
+            reply = await watcher.send('batch', actions=[])
+            self.assertEqual(reply['status'], 400)
+            await watcher.close()
+        self.run_service(scenario)
+
+    def test_batch_rejects_direction_on_predetermined_move(self):
+        async def scenario(port):
+            status, state = await http_request('127.0.0.1', port, 'POST', '/games',
+                                               {'players': ['Alice'], 'categories': ['Math', 'Science', 'English', 'History']})
+            game_id = state['game_id']
+            game = self.service.manager.game(game_id)
+            # On a spoke the move is fixed, so no direction may be given
+            game.active_player().location = 36
+            game.active_player().direction = Direction.DOWN
+            game.state = State.MOVE
+            game.roll = 3
+
+            status, body = await http_request('127.0.0.1', port, 'POST', f'/games/{game_id}/batch', {'actions': [
+                {'action': 'directions'}, {'action': 'move', 'direction': 'CLOCKWISE'}, {'action': 'roll'}]})
+            self.assertFalse(body['ok'])
+            self.assertEqual(body['results'], [{'action': 'directions', 'directions': None}])
+            self.assertEqual((body['error']['index'], body['error']['status']), (1, 400))
+            self.assertEqual((body['state']['state'], body['state']['roll']), ('MOVE', 3))
+            self.assertEqual(body['state']['players'][0]['location'], 36)
+
+            status, body = await http_request('127.0.0.1', port, 'POST', f'/games/{game_id}/move', {'direction': 'DOWN'})
+            self.assertEqual(status, 400)
+            status, body = await http_request('127.0.0.1', port, 'POST', f'/games/{game_id}/move')
+            self.assertEqual(status, 200)
+            self.assertNotEqual(body['state']['players'][0]['location'], 36)
+        self.run_service(scenario)
+
+    def test_every_request_gets_an_answer(self):
+        async def raw(port, request):
+            reader, writer = await asyncio.open_connection('127.0.0.1', port)
+            writer.write(request)
+            await writer.drain()
+            reply = await reader.read()
+            writer.close()
+            return reply
+
+        async def scenario(port):
+            reply = await raw(port, b'POST /games HTTP/1.1\r\nContent-Length: lots\r\n\r\n')
+            self.assertTrue(reply.startswith(b'HTTP/1.1 400 '))
+
+            game = {'players': ['Alice'], 'categories': ['Math', 'Science', 'English', 'History']}
+            with mock.patch.object(self.service.manager, 'start_game', side_effect=RuntimeError('disk full')):
+                status, body = await http_request('127.0.0.1', port, 'POST', '/games', game)
+            self.assertEqual((status, body), (500, {'error': 'RuntimeError: disk full'}))
+            # A game that is gone by the time its state is read
+            with mock.patch.object(self.service.manager, 'start_game', return_value='ended'):
+                status, body = await http_request('127.0.0.1', port, 'POST', '/games', game)
+            self.assertEqual(status, 404)
+        self.run_service(scenario)
+
+    def test_game_being_set_up_does_not_block(self):
+        ready = threading.Event()
+        factory = self.service.manager.retriever_factory
+
+        def slow_factory():
+            # Loading the game's shards takes a while
+            retriever = factory()
+            set_categories = retriever.set_categories
+
+            def slow_set_categories(categories):
+                ready.wait(5)
+                set_categories(categories)
+            retriever.set_categories = slow_set_categories
+            return retriever
+        self.service.manager.retriever_factory = slow_factory
+
+        async def scenario(port):
+            created = asyncio.ensure_future(http_request('127.0.0.1', port, 'POST', '/games',
+                                                         {'players': ['Alice'], 'categories': ['Math', 'Science', 'English', 'History']}))
+            await asyncio.sleep(0.05)
+            # The next game id is unknown until its setup finishes, and asking does not stall the server
+            started = time.perf_counter()
+            status, body = await http_request('127.0.0.1', port, 'GET', '/games/1')
+            self.assertEqual(status, 404)
+            self.assertLess(time.perf_counter() - started, 1)
+            ready.set()
+            status, state = await created
+            self.assertEqual((status, state['game_id']), (201, 1))
+            status, body = await http_request('127.0.0.1', port, 'GET', '/games/1')
+            self.assertEqual(status, 200)
+        self.run_service(scenario)
+
+    def test_load_generator(self):
+        async def scenario(port):
+            return await generate_load('127.0.0.1', port, games=25, players=3, actions=30)
+        stats = self.run_service(scenario)
+        self.assertEqual(stats['actions'], 25 * 30)
+        self.assertEqual(stats['failed'], 0)
+        self.assertEqual(len(self.service.manager), 0)
+
+        async def batched(port):
+            return await generate_load('127.0.0.1', port, games=25, players=3, actions=30, batch=True)
+        stats = self.run_service(batched)
+        self.assertEqual(stats['failed'], 0)
+
+if __name__ == '__main__':
+    unittest.main()
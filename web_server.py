@@ -0,0 +1,442 @@
+import argparse
+import asyncio
+import base64
+import hashlib
+import json
+import os
+import struct
+
+from metrics import METRICS
+from server import Direction, State
+from sessions import SessionManager, UnknownGameError
+from snapshot import SnapshotError, check_players
+
+# asyncio HTTP and WebSocket front-end for remote players, using only the
+# standard library. Games live in a SessionManager; every connection is a
+# coroutine on one event loop. A WebSocket opened on /games/<id>/ws can send
+# the same actions as the HTTP routes, and receives the game's state whenever
+# any client changes it, so nobody has to poll.
+#
+#   GET    /metrics               latency histograms and counters (see metrics.py)
+#   GET    /categories
+#   POST   /games                 {"players": [...], "categories": [...]}
+#   GET    /games/<id>
+#   DELETE /games/<id>
+#   POST   /games/<id>/<action>   roll, directions, move, question, verify
+#   POST   /games/<id>/batch      {"actions": [{"action": "roll"}, ...]}
+#   GET    /games/<id>/ws         WebSocket upgrade
+
+WS_GUID = "258EAFA5-E914-47DA-95CA-C5AB0DC85B11"
+MAX_BODY = 1 << 20
+OP_CONTINUATION, OP_TEXT, OP_BINARY, OP_CLOSE, OP_PING, OP_PONG = 0x0, 0x1, 0x2, 0x8, 0x9, 0xA
+REASONS = {
+    101: 'Switching Protocols', 200: 'OK', 201: 'Created', 400: 'Bad Request', 404: 'Not Found',
+    405: 'Method Not Allowed', 409: 'Conflict', 413: 'Payload Too Large', 500: 'Internal Server Error',
+}
+
+
+class HTTPError(Exception):
+    def __init__(self, status, message):
+        super().__init__(message)
+        self.status = status
+
+
+def mask_payload(payload, key):
+    # XOR with the repeated 4-byte key, done as one big-integer operation
+    n = len(payload)
+    if n == 0:
+        return payload
+    repeated = (key * (n // 4 + 1))[:n]
+    return (int.from_bytes(payload, 'big') ^ int.from_bytes(repeated, 'big')).to_bytes(n, 'big')
+
+
+def encode_frame(opcode, payload, mask=False):
+    # Servers send unmasked frames; clients (the load generator) must mask theirs
+    n = len(payload)
+    mask_bit = 0x80 if mask else 0
+    if n < 126:
+        head = struct.pack('!BB', 0x80 | opcode, mask_bit | n)
+    elif n < 1 << 16:
+        head = struct.pack('!BBH', 0x80 | opcode, mask_bit | 126, n)
+    else:
+        head = struct.pack('!BBQ', 0x80 | opcode, mask_bit | 127, n)
+    if mask:
+        key = os.urandom(4)
+        return head + key + mask_payload(payload, key)
+    return head + payload
+
+
+async def read_frame(reader):
+    first, second = await reader.readexactly(2)
+    length = second & 0x7F
+    if length == 126:
+        length = struct.unpack('!H', await reader.readexactly(2))[0]
+    elif length == 127:
+        length = struct.unpack('!Q', await reader.readexactly(8))[0]
+    if length > MAX_BODY:
+        raise ConnectionError("WebSocket frame too large")
+    key = await reader.readexactly(4) if second & 0x80 else None
+    payload = await reader.readexactly(length)
+    return bool(first & 0x80), first & 0x0F, mask_payload(payload, key) if key else payload
+
+
+async def read_message(reader, writer, mask=False):
+    # (opcode, payload) of the next data or close frame, reassembling
+    # fragments and answering pings along the way
+    parts, message_opcode = [], None
+    while True:
+        fin, opcode, payload = await read_frame(reader)
+        if opcode == OP_PING:
+            writer.write(encode_frame(OP_PONG, payload, mask))
+            continue
+        if opcode == OP_PONG:
+            continue
+        if opcode == OP_CLOSE:
+            return OP_CLOSE, payload
+        if opcode != OP_CONTINUATION:
+            message_opcode = opcode
+        parts.append(payload)
+        if fin:
+            return message_opcode, b''.join(parts)
+
+
+def accept_key(key):
+    return base64.b64encode(hashlib.sha1((key + WS_GUID).encode()).digest()).decode()
+
+
+async def read_request(reader):
+    # (method, path, headers, body), or None when the client closed the connection
+    try:
+        head = await reader.readuntil(b'\r\n\r\n')
+    except asyncio.IncompleteReadError:
+        return None
+    except asyncio.LimitOverrunError:
+        raise HTTPError(413, "Request headers too large")
+    lines = head.decode('latin-1').split('\r\n')
+    try:
+        method, path, _ = lines[0].split(' ', 2)
+    except ValueError:
+        raise HTTPError(400, "Malformed request line")
+    headers = {}
+    for line in lines[1:]:
+        if ':' in line:
+            name, value = line.split(':', 1)
+            headers[name.strip().lower()] = value.strip()
+    try:
+        length = int(headers.get('content-length') or 0)
+    except ValueError:
+        raise HTTPError(400, "Malformed Content-Length")
+    if length < 0:
+        raise HTTPError(400, "Malformed Content-Length")
+    if length > MAX_BODY:
+        raise HTTPError(413, "Request body too large")
+    body = await reader.readexactly(length) if length else b''
+    return method, path.split('?', 1)[0], headers, body
+
+
+def response(status, payload=None, headers=()):
+    # JSON for dicts and lists, plain text for strings
+    lines = [f"HTTP/1.1 {status} {REASONS.get(status, '')}"]
+    if payload is None:
+        body = b''
+    elif isinstance(payload, str):
+        body = payload.encode()
+        lines.append("Content-Type: text/plain; version=0.0.4")
+    else:
+        body = json.dumps(payload).encode()
+        lines.append("Content-Type: application/json")
+    if status != 101:
+        lines.append(f"Content-Length: {len(body)}")
+    lines.extend(headers)
+    return ('\r\n'.join(lines) + '\r\n\r\n').encode() + body
+
+
+def json_value(value):
+    # Spreadsheet answers can be NaN (empty cell) or dates, neither of which is JSON
+    if value is None or isinstance(value, (str, bool, int)):
+        return value
+    if isinstance(value, float):
+        return value if value == value else None
+    return str(value)
+
+
+def question_json(question):
+    if question is None:
+        return None
+    return {'category': json_value(question.category), 'question': json_value(question.question),
+            'answer': json_value(question.answer), 'media': question.media_ref}
+
+
+def parse_direction(name):
+    if name is None:
+        return None
+    try:
+        return Direction[name]
+    except KeyError:
+        raise HTTPError(400, f"Unknown direction {name}")
+
+
+class GameService:
+    def __init__(self, manager=None):
+        self.manager = manager if manager is not None else SessionManager()
+        self.subscribers = {}
+        self.server = None
+
+    async def start(self, host='127.0.0.1', port=8080):
+        self.server = await asyncio.start_server(self.handle, host, port, backlog=4096)
+        return self.server
+
+    @property
+    def port(self):
+        return self.server.sockets[0].getsockname()[1]
+
+    async def close(self):
+        self.server.close()
+        for writers in list(self.subscribers.values()):
+            for writer in list(writers):
+                writer.close()
+        await self.server.wait_closed()
+
+    def game_state(self, game_id):
+        with self.manager.locked(game_id) as session:
+            server = session.server
+            game = server.game
+            return {
+                'game_id': game_id,
+                'state': game.state.name,
+                'turn': game.turn,
+                'roll': game.roll,
+                'categories': server.categories,
+                'players': [{'name': player.name, 'location': player.location, 'direction': player.direction.name,
+                             'score': server.get_score(player)} for player in game.players],
+                'question': question_json(game.question),
+            }
+
+    def apply_action(self, game_id, action, params):
+        # Result of one game action; illegal actions for the current State raise 409
+        game = self.manager.game(game_id)
+        if action == 'roll':
+            result = self.manager.roll(game_id)
+            payload = {'roll': result}
+        elif action == 'directions':
+            directions = self.manager.get_available_directions(game_id)
+            return {'directions': None if directions is None else sorted(d.name for d in directions)}
+        elif action == 'move':
+            direction = parse_direction(params.get('direction'))
+            if game.state == State.MOVE:
+                directions = self.manager.get_available_directions(game_id)
+                if directions is None and direction is not None:
+                    raise HTTPError(400, "This move has no choice of direction")
+                if directions is not None and direction not in directions:
+                    raise HTTPError(400, f"Choose a direction from {sorted(d.name for d in directions)}")
+            result = self.manager.move(game_id, direction)
+            payload = {}
+        elif action == 'question':
+            try:
+                result = self.manager.get_question(game_id, params.get('category'))
+            except ValueError as e:
+                raise HTTPError(400, str(e))
+            payload = {'question': question_json(result)}
+        elif action == 'verify':
+            if game.state != State.QUESTION:
+                raise HTTPError(409, f"verify is not allowed in state {game.state.name}")
+            result = self.manager.verify_question(game_id, bool(params.get('correct')))
+            payload = {}
+        else:
+            raise HTTPError(404, f"Unknown action {action}")
+        if isinstance(result, int) and result == -1:
+            raise HTTPError(409, f"{action} is not allowed in state {game.state.name}")
+        return payload
+
+    def game_id(self, text):
+        game_id = int(text) if text.isdigit() else text
+        if game_id not in self.manager:
+            raise HTTPError(404, f"No game {text}")
+        return game_id
+
+    async def handle(self, reader, writer):
+        try:
+            while True:
+                try:
+                    request = await read_request(reader)
+                except HTTPError as e:
+                    # Where the next request starts is unknown, so answer and hang up
+                    writer.write(response(e.status, {'error': str(e)}))
+                    await writer.drain()
+                    break
+                if request is None:
+                    break
+                method, path, headers, body = request
+                try:
+                    parts = [part for part in path.split('/') if part]
+                    if method == 'GET' and len(parts) == 3 and parts[0] == 'games' and parts[2] == 'ws':
+                        await self.websocket(reader, writer, self.game_id(parts[1]), headers)
+                        break
+                    status, payload = await self.route(method, parts, body)
+                except HTTPError as e:
+                    status, payload = e.status, {'error': str(e)}
+                except (ConnectionError, asyncio.IncompleteReadError):
+                    raise
+                except UnknownGameError as e:
+                    # The game ended while the request was being handled
+                    status, payload = 404, {'error': f"No game {e.args[0]}"}
+                except Exception as e:
+                    status, payload = 500, {'error': f"{type(e).__name__}: {e}"}
+                writer.write(response(status, payload))
+                await writer.drain()
+        except (ConnectionError, asyncio.IncompleteReadError):
+            pass
+        finally:
+            writer.close()
+
+    async def route(self, method, parts, body):
+        try:
+            params = json.loads(body) if body else {}
+        except ValueError:
+            raise HTTPError(400, "Body is not valid JSON")
+        if not isinstance(params, dict):
+            raise HTTPError(400, "Body must be a JSON object")
+
+        if parts == ['metrics'] and method == 'GET':
+            return 200, METRICS.render()
+        if parts == ['categories'] and method == 'GET':
+            retriever = await asyncio.to_thread(self.manager.retriever_factory)
+            return 200, {'categories': [json_value(cat) for cat in retriever.get_categories_excel()]}
+        if parts == ['games'] and method == 'POST':
+            players, categories = params.get('players'), params.get('categories')
+            if not players or not categories or len(categories) != 4:
+                raise HTTPError(400, "A game needs players and four categories")
+            if not isinstance(players, list) or not all(isinstance(name, str) for name in players):
+                raise HTTPError(400, "Players must be a list of names")
+            try:
+                check_players(players)
+            except SnapshotError as e:
+                raise HTTPError(400, str(e))
+            # Loading the category shards reads files, so keep it off the event loop
+            game_id = await asyncio.to_thread(self.manager.start_game, players, categories)
+            return 201, self.game_state(game_id)
+        if len(parts) < 2 or parts[0] != 'games':
+            raise HTTPError(404, "Not found")
+
+        game_id = self.game_id(parts[1])
+        if len(parts) == 2 and method == 'GET':
+            return 200, self.game_state(game_id)
+        if len(parts) == 2 and method == 'DELETE':
+            self.manager.end_game(game_id)
+            await self.broadcast(game_id, {'type': 'ended', 'game_id': game_id})
+            return 200, {'game_id': game_id}
+        if len(parts) == 3 and method == 'POST':
+            return 200, await self.perform(game_id, parts[2], params)
+        raise HTTPError(405, "Method not allowed")
+
+    def run_action(self, game_id, action, params):
+        try:
+            return self.apply_action(game_id, action, params)
+        except UnknownGameError:
+            raise HTTPError(404, f"No game {game_id}")
+        except HTTPError:
+            raise
+        except Exception as e:
+            raise HTTPError(500, str(e))
+
+    async def perform(self, game_id, action, params):
+        if action == 'batch':
+            return await self.perform_batch(game_id, params.get('actions'))
+        result = self.run_action(game_id, action, params)
+        state = self.game_state(game_id)
+        if action != 'directions':
+            await self.broadcast(game_id, dict(state, type='state'))
+        return dict(result, state=state)
+
+    async def perform_batch(self, game_id, actions):
+        # Applies a list of {"action": ..., ...} in order while holding the
+        # game's lock, so a whole turn is one round trip. The batch stops at
+        # the first action that fails; results of the earlier ones are kept.
+        if not isinstance(actions, list) or not actions:
+            raise HTTPError(400, "A batch needs a list of actions")
+        results, error = [], None
+        try:
+            with self.manager.locked(game_id):
+                for index, params in enumerate(actions):
+                    try:
+                        if not isinstance(params, dict) or not isinstance(params.get('action'), str):
+                            raise HTTPError(400, "Every batch entry needs an action")
+                        if params['action'] == 'batch':
+                            raise HTTPError(400, "Batches cannot be nested")
+                        results.append(dict(self.run_action(game_id, params['action'], params), action=params['action']))
+                    except HTTPError as e:
+                        error = {'index': index, 'status': e.status, 'error': str(e)}
+                        break
+                state = self.game_state(game_id)
+        except UnknownGameError:
+            raise HTTPError(404, f"No game {game_id}")
+        if any(result['action'] != 'directions' for result in results):
+            await self.broadcast(game_id, dict(state, type='state'))
+        return {'ok': error is None, 'results': results, 'error': error, 'state': state}
+
+    async def broadcast(self, game_id, message):
+        writers = self.subscribers.get(game_id)
+        if not writers:
+            return
+        frame = encode_frame(OP_TEXT, json.dumps(message).encode())
+        for writer in list(writers):
+            writer.write(frame)
+        await asyncio.gather(*(writer.drain() for writer in list(writers)), return_exceptions=True)
+
+    async def websocket(self, reader, writer, game_id, headers):
+        key = headers.get('sec-websocket-key')
+        if headers.get('upgrade', '').lower() != 'websocket' or not key:
+            raise HTTPError(400, "Expected a WebSocket upgrade")
+        writer.write(response(101, headers=["Upgrade: websocket", "Connection: Upgrade",
+                                            f"Sec-WebSocket-Accept: {accept_key(key)}"]))
+        writers = self.subscribers.setdefault(game_id, set())
+        writers.add(writer)
+        try:
+            writer.write(encode_frame(OP_TEXT, json.dumps(dict(self.game_state(game_id), type='state')).encode()))
+            await writer.drain()
+            while True:
+                opcode, payload = await read_message(reader, writer)
+                if opcode == OP_CLOSE:
+                    writer.write(encode_frame(OP_CLOSE, payload[:2]))
+                    break
+                message_id = None
+                try:
+                    message = json.loads(payload)
+                    message_id = message.pop('id', None)
+                    action = message.pop('action')
+                    reply = {'type': 'result', 'id': message_id, 'ok': True}
+                    reply.update(await self.perform(game_id, action, message))
+                except HTTPError as e:
+                    reply = {'type': 'result', 'id': message_id, 'ok': False, 'status': e.status, 'error': str(e)}
+                except (ValueError, KeyError, AttributeError, TypeError):
+                    reply = {'type': 'result', 'id': message_id, 'ok': False, 'status': 400, 'error': "Expected a JSON object with an action"}
+                writer.write(encode_frame(OP_TEXT, json.dumps(reply).encode()))
+                await writer.drain()
+        finally:
+            writers.discard(writer)
+            if not writers:
+                self.subscribers.pop(game_id, None)
+
+
+async def serve(host, port, metrics=False, metrics_file=None, metrics_interval=10.0):
+    if metrics or metrics_file:
+        METRICS.enable()
+    if metrics_file:
+        METRICS.start_dumping(metrics_interval, metrics_file)
+    service = GameService()
+    service.manager.start_reaper()
+    await service.start(host, port)
+    print(f"Serving games on http://{host}:{service.port}")
+    async with service.server:
+        await service.server.serve_forever()
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description="Serve Trivial Compute games over HTTP and WebSocket")
+    parser.add_argument('--host', default='127.0.0.1')
+    parser.add_argument('--port', type=int, default=8080)
+    parser.add_argument('--metrics', action='store_true', help="record call latencies, served at /metrics")
+    parser.add_argument('--metrics-file', help="also write the metrics to this file periodically")
+    parser.add_argument('--metrics-interval', type=float, default=10.0)
+    args = parser.parse_args()
+    asyncio.run(serve(args.host, args.port, args.metrics, args.metrics_file, args.metrics_interval))